@@ -27,6 +27,11 @@ class PersistenceBackend(ABC):
         """Save a key-value pair."""
         pass
     
+    def save_many(self, data: Dict[str, Any]):
+        """Save several key-value pairs (backends override to batch them)."""
+        for key, value in data.items():
+            self.save(key, value)
+    
     @abstractmethod
     def load(self, key: str) -> Optional[Any]:
         """Load a value by key."""
@@ -111,6 +116,20 @@ class SQLitePersistence(PersistenceBackend):
                 (key, value_json)
             )
     
+    def save_many(self, data: Dict[str, Any]):
+        """
+        Save several key-value pairs to SQLite in one transaction,
+        so the batch costs one commit instead of one per key.
+        
+        Args:
+            data: Dictionary of key-value pairs (values will be JSON-serialized)
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in data.items()]
+            )
+    
     def load(self, key: str) -> Optional[Any]:
         """
         Load a value by key from SQLite.
@@ -248,6 +267,18 @@ class PostgreSQLPersistence(PersistenceBackend):
             )
             self.conn.commit()
     
+    def save_many(self, data: Dict[str, Any]):
+        """Save several key-value pairs to PostgreSQL in one transaction."""
+        with self.conn.cursor() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO kv_store (key, value) VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                """,
+                [(key, json.dumps(value)) for key, value in data.items()]
+            )
+            self.conn.commit()
+    
     def load(self, key: str) -> Optional[Any]:
         """Load a value by key from PostgreSQL."""
         with self.conn.cursor() as cursor:
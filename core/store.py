@@ -69,6 +69,29 @@ class KeyValueStore:
             if self._persistence:
                 self._persistence.save(key, value)
     
+    def mset(self, data: Dict[str, Any]) -> None:
+        """
+        Set multiple key-value pairs with a single WAL write.
+        Unlike update(), every pair is logged, so the batch survives a crash.
+        
+        Args:
+            data: Dictionary of key-value pairs to set
+        """
+        if not data:
+            return
+        
+        with self._lock_manager.lock_multiple(*data):
+            # Log to WAL first
+            if self._wal:
+                self._wal.log_batch(data)
+            
+            # Update in-memory store
+            self._data.update(data)
+            
+            # Persist to backend in one transaction
+            if self._persistence:
+                self._persistence.save_many(data)
+    
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value by key from the store.
@@ -176,6 +199,17 @@ class KeyValueStore:
         with self._global_lock:
             return len(self._data)
     
+    def size_fast(self) -> int:
+        """
+        Get the number of key-value pairs without taking the global lock.
+        len() on a dict is atomic under the GIL, so the result is at most
+        stale with respect to writes in flight.
+        
+        Returns:
+            Number of entries
+        """
+        return len(self._data)
+    
     def update(self, data: Dict[str, Any]) -> None:
         """
         Batch update multiple key-value pairs.
@@ -225,8 +259,7 @@ class KeyValueStore:
         
         # Persist recovered data
         if self._persistence:
-            for key, value in self._data.items():
-                self._persistence.save(key, value)
+            self._persistence.save_many(self._data)
         
         # Truncate WAL after successful recovery
         if self._wal:
@@ -94,6 +94,28 @@ class WAL:
         )
         self._write_entry(entry)
     
+    def log_batch(self, data: Dict[str, Any]):
+        """
+        Log a SET operation for every pair with a single write and fsync.
+        
+        Args:
+            data: Dictionary of key-value pairs being set
+        """
+        if not self._enabled or not data:
+            return
+        
+        timestamp = datetime.utcnow().isoformat()
+        entries = [
+            WALEntry(
+                timestamp=timestamp,
+                operation=WALOperation.SET.value,
+                key=key,
+                value=value
+            )
+            for key, value in data.items()
+        ]
+        self._write_entries(entries)
+    
     def log_delete(self, key: str):
         """
         Log a DELETE operation.
@@ -138,6 +160,20 @@ class WAL:
             self._file_handle.flush()  # Ensure it's written to disk
             os.fsync(self._file_handle.fileno())  # Force OS to write to disk
     
+    def _write_entries(self, entries: List[WALEntry]):
+        """
+        Write several entries to the WAL file with one fsync.
+        
+        Args:
+            entries: The WAL entries to write, in order
+        """
+        payload = ''.join(entry.to_json() + '\n' for entry in entries)
+        with self._lock:
+            self.open()
+            self._file_handle.write(payload)
+            self._file_handle.flush()
+            os.fsync(self._file_handle.fileno())
+    
     def replay(self) -> List[WALEntry]:
         """
         Read and return all entries from the WAL file.
@@ -12,9 +12,31 @@ Metrics exposed:
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, REGISTRY
 from fastapi import Response
 from typing import Optional
+import functools
+import logging
+import os
 import time
 
 
+logger = logging.getLogger(__name__)
+
+# Label values must come from small, static sets. A per-key or per-URL label
+# creates a new time series for every distinct value and grows Prometheus
+# memory without bound.
+_ALLOWED_OPS = frozenset({'get', 'set', 'delete', 'exists', 'keys'})
+_ALLOWED_STATUSES = frozenset({'ok', 'error', 'timeout'})
+_ALLOWED_VALUES = {
+    'operation': _ALLOWED_OPS,
+    'status': _ALLOWED_STATUSES,
+}
+_reported_labels = set()
+
+# Raise on unexpected label values instead of folding them into "other".
+# Meant for development and tests (MINIKV_STRICT_METRICS=1); off by default
+# so a bad label never turns a served request into an error.
+STRICT_LABELS = os.environ.get("MINIKV_STRICT_METRICS", "") not in ("", "0")
+
+
 # Request metrics
 request_count = Counter(
     'minikv_requests_total',
@@ -69,6 +91,36 @@ gateway_request_latency = Histogram(
 )
 
 
+def _safe_labels(metric, **labels):
+    """
+    Resolve a labelled child of metric, rejecting unbounded label values.
+    
+    Unknown operation/status values are logged once and folded into
+    "other", so the number of series stays bounded. With STRICT_LABELS
+    set they raise ValueError instead.
+    
+    Args:
+        metric: Prometheus metric with labels
+        **labels: Label name/value pairs
+    
+    Returns:
+        The labelled metric child
+    """
+    for name, value in labels.items():
+        allowed = _ALLOWED_VALUES.get(name)
+        if allowed is None or value in allowed:
+            continue
+        if STRICT_LABELS:
+            raise ValueError(
+                f"Label {name}={value!r} not in allowed set {sorted(allowed)}"
+            )
+        if (name, value) not in _reported_labels:
+            _reported_labels.add((name, value))
+            logger.warning("Unexpected metric label %s=%r, recording as 'other'", name, value)
+        labels[name] = 'other'
+    return metric.labels(**labels)
+
+
 class MetricsTracker:
     """Helper class to track metrics with timing"""
     
@@ -79,15 +131,45 @@ class MetricsTracker:
         """Context manager to track request metrics"""
         return RequestTimer(self.node_id, operation)
     
+    def timed(self, operation: str):
+        """
+        Decorator that records count and latency for an async route handler.
+        Metric children are resolved once when the route is defined, so each
+        request only pays for observe() and inc().
+        
+        Args:
+            operation: Operation label for the wrapped handler
+        """
+        def decorator(func):
+            if self.node_id is None:
+                return func
+            
+            counter = _safe_labels(request_count, node_id=self.node_id, operation=operation)
+            histogram = _safe_labels(request_latency, node_id=self.node_id, operation=operation)
+            perf_counter = time.perf_counter
+            
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(perf_counter() - start)
+                    counter.inc()
+            
+            return wrapper
+        
+        return decorator
+    
     def update_store_size(self, size: int):
         """Update store size gauge"""
         if self.node_id is not None:
-            store_size.labels(node_id=self.node_id).set(size)
+            _safe_labels(store_size, node_id=self.node_id).set(size)
     
     def increment_replication_failure(self):
         """Increment replication failure counter"""
         if self.node_id is not None:
-            replication_failures.labels(node_id=self.node_id).inc()
+            _safe_labels(replication_failures, node_id=self.node_id).inc()
 
 
 class RequestTimer:
@@ -106,12 +188,14 @@ class RequestTimer:
         duration = time.time() - self.start_time
         
         if self.node_id is not None:
-            request_count.labels(
+            _safe_labels(
+                request_count,
                 node_id=self.node_id,
                 operation=self.operation
             ).inc()
             
-            request_latency.labels(
+            _safe_labels(
+                request_latency,
                 node_id=self.node_id,
                 operation=self.operation
             ).observe(duration)
@@ -9,26 +9,56 @@ WHY ASYNC REPLICATION?
 """
 
 from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, List, Tuple
 import uvicorn
 import asyncio
 import httpx
+import logging
+import msgspec
+import sys
 import time
 
 from server.router import Router
+from .metrics import MetricsTracker, add_metrics_endpoint
 
 
-class SetRequest(BaseModel):
-    """Request model for SET operations"""
+logger = logging.getLogger(__name__)
+
+# libuv event loop and C HTTP parser when available (not on Windows)
+try:
+    import uvloop  # noqa: F401
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+    UVICORN_HTTP = "httptools"
+except ImportError:
+    UVICORN_HTTP = "h11"
+
+
+class SetRequest(msgspec.Struct):
+    """Request model for SET operations (decoded straight from the body bytes)"""
     key: str
     value: Any
     is_replica: bool = False  # True if this is a replication write
 
 
-class GetRequest(BaseModel):
-    """Request model for GET operations"""
-    key: str
+_decode_set_request = msgspec.json.Decoder(SetRequest).decode
+
+# /set reads the raw body, so FastAPI can't infer its schema; document it
+# from the msgspec struct instead (inlined, since it has no nested refs)
+_SET_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": msgspec.json.schema_components([SetRequest])[1]["SetRequest"]
+            }
+        }
+    }
+}
 
 
 class NodeServer:
@@ -37,7 +67,14 @@ class NodeServer:
     Each node maintains its own in-memory store, WAL, and persistence.
     """
     
-    def __init__(self, node_id: int, port: int, num_workers: int = 4):
+    def __init__(
+        self,
+        node_id: int,
+        port: int,
+        num_workers: int = 4,
+        replication_workers: int = 4,
+        replication_queue_size: int = 1024
+    ):
         """
         Initialize node server.
         
@@ -45,6 +82,8 @@ class NodeServer:
             node_id: Unique identifier for this node (1, 2, 3)
             port: HTTP port for this node (8001, 8002, 8003)
             num_workers: Number of worker threads for Router
+            replication_workers: Number of coroutines draining the replication queue
+            replication_queue_size: Max pending replication ops before new ones are dropped
         """
         self.node_id = node_id
         self.port = port
@@ -62,37 +101,83 @@ class NodeServer:
         
         # Track cluster peers for replication
         self.peers: Dict[int, str] = {}  # {node_id: "http://host:port"}
+        # Immutable copy of peers.items() iterated on the hot path;
+        # rebuilt only when peers are registered
+        self._peers_snapshot: Tuple[Tuple[int, str], ...] = ()
+        
+        # Bounded replication queue drained by a fixed pool of coroutines,
+        # so write bursts cannot spawn an unbounded number of tasks
+        self.replication_workers = replication_workers
+        self.replication_queue_size = replication_queue_size
+        # Python 3.10+ queues bind to a loop on first use, so the queue can
+        # exist before the server starts; older versions bind at construction
+        # and must wait for the startup hook to run on the server's loop
+        self._repl_q: Optional[asyncio.Queue] = None
+        if sys.version_info >= (3, 10):
+            self._repl_q = asyncio.Queue(maxsize=replication_queue_size)
+        self._repl_tasks: List[asyncio.Task] = []
         
         # Metrics
         self.total_reads = 0
         self.total_writes = 0
         self.replication_failures = 0
+        self.replication_dropped = 0
         self.start_time = time.time()
+        self.metrics = MetricsTracker(node_id=node_id)
+        self.gauge_interval = 1.0
+        self._gauge_task = None
         
         self._setup_routes()
+        add_metrics_endpoint(self.app, node_id)
     
     def _setup_routes(self):
         """Setup FastAPI routes for node operations"""
         
-        @self.app.post("/set")
-        async def set_key(req: SetRequest):
+        @self.app.on_event("startup")
+        async def startup():
+            """Start background tasks on node startup"""
+            self._gauge_task = asyncio.create_task(self._gauge_loop())
+            if self._repl_q is None:
+                self._repl_q = asyncio.Queue(maxsize=self.replication_queue_size)
+            self._repl_tasks = [
+                asyncio.create_task(self._repl_worker())
+                for _ in range(self.replication_workers)
+            ]
+        
+        @self.app.on_event("shutdown")
+        async def shutdown():
+            """Clean shutdown of background tasks"""
+            if self._gauge_task:
+                self._gauge_task.cancel()
+            for task in self._repl_tasks:
+                task.cancel()
+        
+        @self.app.post("/set", openapi_extra=_SET_REQUEST_OPENAPI)
+        @self.metrics.timed("set")
+        async def set_key(request: Request):
             """
             Set a key-value pair (primary write).
             If this is a primary write, asynchronously replicate to peers.
             """
             try:
-                self.router.set(req.key, req.value)
+                req = _decode_set_request(await request.body())
+            except msgspec.DecodeError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            
+            try:
+                await self.router.aset(req.key, req.value)
                 self.total_writes += 1
                 
                 # Async replicate to peers (if not already a replica write)
-                if not req.is_replica and self.peers:
-                    asyncio.create_task(self._replicate_set(req.key, req.value))
+                if not req.is_replica and self._peers_snapshot:
+                    self._enqueue_replication("set", req.key, req.value)
                 
                 return {"status": "ok", "node_id": self.node_id}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
         
         @self.app.get("/get/{key}")
+        @self.metrics.timed("get")
         async def get_key(key: str):
             """
             Get a value by key.
@@ -103,7 +188,7 @@ class NodeServer:
                 self.total_reads += 1
                 
                 # Background read repair (don't wait for it)
-                if value is not None and self.peers:
+                if value is not None and self._peers_snapshot:
                     asyncio.create_task(self._read_repair(key, value))
                 
                 return {"key": key, "value": value, "node_id": self.node_id}
@@ -111,21 +196,23 @@ class NodeServer:
                 raise HTTPException(status_code=500, detail=str(e))
         
         @self.app.delete("/delete/{key}")
+        @self.metrics.timed("delete")
         async def delete_key(key: str):
             """Delete a key and replicate deletion to peers"""
             try:
-                deleted = self.router.delete(key)
+                deleted = await self.router.adelete(key)
                 self.total_writes += 1
                 
                 # Async replicate deletion
-                if self.peers:
-                    asyncio.create_task(self._replicate_delete(key))
+                if self._peers_snapshot:
+                    self._enqueue_replication("delete", key)
                 
                 return {"deleted": deleted, "node_id": self.node_id}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
         
         @self.app.get("/exists/{key}")
+        @self.metrics.timed("exists")
         async def exists_key(key: str):
             """Check if key exists"""
             try:
@@ -135,6 +222,7 @@ class NodeServer:
                 raise HTTPException(status_code=500, detail=str(e))
         
         @self.app.get("/keys")
+        @self.metrics.timed("keys")
         async def get_keys():
             """Get all keys in this node"""
             try:
@@ -154,10 +242,11 @@ class NodeServer:
                 "node_id": self.node_id,
                 "status": "healthy",
                 "uptime_seconds": int(uptime),
-                "store_size": self.router.size(),
+                "store_size": self.router.size_fast(),
                 "total_reads": self.total_reads,
                 "total_writes": self.total_writes,
                 "replication_failures": self.replication_failures,
+                "replication_dropped": self.replication_dropped,
                 "peers": len(self.peers)
             }
         
@@ -171,7 +260,7 @@ class NodeServer:
             
             # Get all data for Merkle tree comparison
             all_items = self.router.items()
-            data_dict = {k: v for k, v in all_items}
+            data_dict = dict(all_items)
             
             return {
                 "node_id": self.node_id,
@@ -179,6 +268,7 @@ class NodeServer:
                 "total_reads": self.total_reads,
                 "total_writes": self.total_writes,
                 "replication_failures": self.replication_failures,
+                "replication_dropped": self.replication_dropped,
                 "router_stats": router_stats,
                 "data": data_dict  # All key-value pairs for anti-entropy
             }
@@ -189,7 +279,12 @@ class NodeServer:
             Register a peer node for replication.
             Called by cluster manager during initialization.
             """
-            self.peers[peer_id] = peer_url
+            # Copy-on-write: build the new mapping aside, then rebind both
+            # attributes so readers never observe a dict mid-update
+            new_peers = dict(self.peers)
+            new_peers[peer_id] = peer_url
+            self.peers = new_peers
+            self._peers_snapshot = tuple(new_peers.items())
             return {
                 "status": "ok",
                 "message": f"Registered peer {peer_id}",
@@ -207,6 +302,45 @@ class NodeServer:
                 "status": "running"
             }
     
+    async def _gauge_loop(self):
+        """
+        Periodically publish the store size gauge.
+        Sampling once per interval keeps Prometheus client locking off the
+        write path, at the cost of the gauge lagging by up to one interval.
+        """
+        while True:
+            await asyncio.sleep(self.gauge_interval)
+            self.metrics.update_store_size(self.router.size_fast())
+    
+    def _enqueue_replication(self, op: str, key: str, value: Any = None):
+        """
+        Queue a replication op for the worker pool.
+        When the queue is full (or not created yet) the op is dropped and
+        counted; anti-entropy repairs the replicas later. The local write has
+        already been applied, so this must never fail the request.
+        """
+        if self._repl_q is None:
+            self.replication_dropped += 1
+            return
+        try:
+            self._repl_q.put_nowait((op, key, value))
+        except asyncio.QueueFull:
+            self.replication_dropped += 1
+    
+    async def _repl_worker(self):
+        """Drain the replication queue until cancelled"""
+        while True:
+            op, key, value = await self._repl_q.get()
+            try:
+                if op == "set":
+                    await self._replicate_set(key, value)
+                else:
+                    await self._replicate_delete(key)
+            except Exception:
+                self.replication_failures += 1
+            finally:
+                self._repl_q.task_done()
+    
     async def _replicate_set(self, key: str, value: Any):
         """
         Replicate SET operation to peer nodes asynchronously.
@@ -216,10 +350,14 @@ class NodeServer:
             key: Key to replicate
             value: Value to replicate
         """
+        peers = self._peers_snapshot
+        if not peers:
+            return
+        
         async with httpx.AsyncClient() as client:
             # Replicate to ALL peers (eventually consistent)
             tasks = []
-            for peer_id, peer_url in self.peers.items():
+            for peer_id, peer_url in peers:
                 tasks.append(self._replicate_to_peer(
                     client, peer_url, key, value, peer_id
                 ))
@@ -246,15 +384,19 @@ class NodeServer:
             if response.status_code != 200:
                 self.replication_failures += 1
         except Exception as e:
-            # Log failure but don't crash
+            # Counted, not printed: a flapping peer must not stall the event loop
             self.replication_failures += 1
-            print(f"[Node {self.node_id}] Replication to node {peer_id} failed: {e}")
+            logger.debug("Replication to node %d failed: %s", peer_id, e)
     
     async def _replicate_delete(self, key: str):
         """Replicate DELETE operation to peer nodes asynchronously"""
+        peers = self._peers_snapshot
+        if not peers:
+            return
+        
         async with httpx.AsyncClient() as client:
             tasks = []
-            for peer_id, peer_url in self.peers.items():
+            for peer_id, peer_url in peers:
                 tasks.append(self._delete_from_peer(client, peer_url, key, peer_id))
             
             if tasks:
@@ -272,7 +414,7 @@ class NodeServer:
             await client.delete(f"{peer_url}/delete/{key}", timeout=2.0)
         except Exception as e:
             self.replication_failures += 1
-            print(f"[Node {self.node_id}] Delete replication to node {peer_id} failed: {e}")
+            logger.debug("Delete replication to node %d failed: %s", peer_id, e)
     
     async def _read_repair(self, key: str, expected_value: Any):
         """
@@ -283,8 +425,12 @@ class NodeServer:
             key: Key that was read
             expected_value: Value from primary node
         """
+        peers = self._peers_snapshot
+        if not peers:
+            return
+        
         async with httpx.AsyncClient() as client:
-            for peer_id, peer_url in self.peers.items():
+            for peer_id, peer_url in peers:
                 try:
                     # Check if peer has the key
                     response = await client.get(
@@ -313,7 +459,9 @@ class NodeServer:
             self.app,
             host="0.0.0.0",
             port=self.port,
-            log_level="info"
+            log_level="info",
+            loop=UVICORN_LOOP,
+            http=UVICORN_HTTP
         )
     
     def stop(self):
@@ -3,12 +3,13 @@ Server components for MiniKV.
 """
 
 from .router import Router
-from .worker import Worker, WorkerRequest, OperationType
+from .worker import Worker, WorkerRequest, OperationType, RequestQueue
 
 __all__ = [
     'Router',
     'Worker',
     'WorkerRequest',
     'OperationType',
+    'RequestQueue',
 ]
 
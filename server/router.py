@@ -3,14 +3,31 @@ Request router that dispatches incoming requests to a thread pool.
 Manages worker threads and provides a high-level API for the KV store.
 """
 
+import asyncio
+import itertools
+import os
 import queue
 import threading
 from typing import Any, Dict, Optional, List
-from .worker import Worker, WorkerRequest, OperationType
+from .worker import Worker, WorkerRequest, OperationType, _Inbox
 from core.store import KeyValueStore
 from core.persistence import SQLitePersistence
 
 
+# Error set on requests that stop() failed before they could run
+_SHUTDOWN_ERROR = "Router is shutting down"
+
+
+class _RequestCount:
+    """Requests accepted from one submitting thread; only it writes value."""
+    
+    __slots__ = ('value', 'owner')
+    
+    def __init__(self, owner: threading.Thread):
+        self.value = 0
+        self.owner = owner
+
+
 class Router:
     """
     Request router that manages a pool of worker threads.
@@ -24,20 +41,35 @@ class Router:
         enable_persistence: bool = True,
         enable_wal: bool = True,
         db_path: str = "minikv.db",
-        wal_path: str = "minikv.wal"
+        wal_path: str = "minikv.wal",
+        *,
+        batch_size: int = 32,
+        steal_threshold: int = 4,
+        pin_workers: bool = False,
+        spin_count: int = 0
     ):
         """
         Initialize the router with a worker pool.
         
         Args:
             num_workers: Number of worker threads to create
-            queue_size: Maximum size of the request queue
+            queue_size: Maximum number of pending requests per worker
             enable_persistence: Whether to enable SQLite persistence
             enable_wal: Whether to enable write-ahead logging
             db_path: Path to the database file
             wal_path: Path to the WAL file
+            batch_size: Max requests a worker drains at once; consecutive
+                SETs are written to the store together (1 disables batching)
+            steal_threshold: Backlog at which idle workers steal from a busy
+                one; below it, each key is only handled by its home worker
+            pin_workers: Pin each worker thread to its own CPU (Linux only)
+            spin_count: Times a submitter polls for its result before
+                blocking on a condition variable. Only pays off when workers
+                run in parallel (free-threaded builds); under the GIL the
+                worker cannot progress while we spin, so it defaults to 0
         """
         self.num_workers = num_workers
+        self.spin_count = spin_count
         
         # Create the key-value store
         persistence = SQLitePersistence(db_path) if enable_persistence else None
@@ -47,48 +79,150 @@ class Router:
             wal_file=wal_path
         )
         
-        # Create request queue
-        self.request_queue = queue.Queue(maxsize=queue_size)
+        # CPUs available to this process, for optional worker pinning
+        cpus: List[int] = []
+        if pin_workers and hasattr(os, 'sched_getaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
         
-        # Create worker pool
+        # Create worker pool; each worker owns its request queue
         self.workers: List[Worker] = []
         for i in range(num_workers):
-            worker = Worker(i, self.request_queue, self.store)
+            worker = Worker(
+                i, self.store, queue_size, batch_size, steal_threshold,
+                cpu=cpus[i % len(cpus)] if cpus else None
+            )
             self.workers.append(worker)
         
+        # Idle workers steal from every other worker
+        for worker in self.workers:
+            worker.victims = [w for w in self.workers if w is not worker]
+        
+        # Round-robin cursor for requests without a key
+        self._next_worker = itertools.count()
+        
         # Statistics
-        self._lock = threading.Lock()
-        self._total_requests = 0
-        self._running = False
+        # Each submitting thread bumps its own counter, so counting needs no
+        # lock on the hot path. Counters of threads that have exited are
+        # folded into _retired_requests when a new thread registers, so
+        # thread churn doesn't grow the list. The lock guards registering,
+        # folding and summing, never the increment itself.
+        self._request_counts: List[_RequestCount] = []
+        self._retired_requests = 0
+        self._counts_lock = threading.Lock()
+        
+        # Set whenever the router is not accepting requests (before start()
+        # and from the moment stop() begins); the lock serializes start/stop
+        self._shutdown = threading.Event()
+        self._shutdown.set()
+        self._lifecycle_lock = threading.Lock()
+        
+        # Per-submitter-thread wakeup signal, shared by its requests
+        self._tls = threading.local()
+    
+    @property
+    def running(self) -> bool:
+        """Whether the router is accepting requests."""
+        return not self._shutdown.is_set()
     
     def start(self):
         """Start all worker threads."""
-        if self._running:
-            return
-        
-        self._running = True
-        for worker in self.workers:
-            worker.start()
+        with self._lifecycle_lock:
+            if not self._shutdown.is_set():
+                return
+            
+            for worker in self.workers:
+                worker.start()
+            self._shutdown.clear()
     
     def stop(self):
         """Stop all worker threads gracefully."""
-        if not self._running:
-            return
-        
-        self._running = False
+        with self._lifecycle_lock:
+            if self._shutdown.is_set():
+                return
+            
+            # Refuse new requests before the sentinels go in
+            self._shutdown.set()
         
         # Send shutdown signal to all workers
-        for _ in self.workers:
+        for worker in self.workers:
             shutdown_request = WorkerRequest(operation=OperationType.SHUTDOWN)
-            self.request_queue.put(shutdown_request)
+            worker.submit(shutdown_request)
         
         # Wait for all workers to stop
         for worker in self.workers:
             worker.stop()
         
+        # Anything queued behind a sentinel will never run; fail it so
+        # submitters racing with stop() are woken instead of timing out
+        for worker in self.workers:
+            worker.fail_pending(_SHUTDOWN_ERROR)
+        
         # Close the store
         self.store.close()
     
+    def _worker_for(self, request: WorkerRequest) -> Worker:
+        """
+        Pick the worker whose queue receives a request.
+        Keyed requests are sharded by key hash (SipHash for str keys) so a
+        key stays on one worker and its lock and dict entry stay warm on
+        that thread; keyless requests are spread round-robin.
+        
+        Args:
+            request: The request to route
+            
+        Returns:
+            The target worker
+        """
+        if request.key is not None:
+            return self.workers[hash(request.key) % self.num_workers]
+        return self.workers[next(self._next_worker) % self.num_workers]
+    
+    def _inbox(self) -> _Inbox:
+        """Get the calling thread's wakeup signal, creating it on first use."""
+        inbox = getattr(self._tls, 'inbox', None)
+        if inbox is None:
+            inbox = self._tls.inbox = _Inbox()
+        return inbox
+    
+    def _count_request(self):
+        """Count a request against the calling thread's counter."""
+        count = getattr(self._tls, 'count', None)
+        if count is None:
+            count = self._tls.count = _RequestCount(threading.current_thread())
+            with self._counts_lock:
+                self._prune_request_counts()
+                self._request_counts.append(count)
+        count.value += 1
+    
+    def _prune_request_counts(self):
+        """
+        Fold counters of exited threads into the retired total.
+        A thread that is no longer alive can't increment its counter again,
+        so its final value is safe to read. Caller holds _counts_lock.
+        """
+        live = []
+        for count in self._request_counts:
+            if count.owner.is_alive():
+                live.append(count)
+            else:
+                self._retired_requests += count.value
+        self._request_counts = live
+    
+    def _begin_direct(self):
+        """
+        Account for a request served on the calling thread.
+        Reads and bulk writes go straight to the store, which is already
+        thread-safe; queueing them through a worker only adds hand-off
+        latency.
+        
+        Raises:
+            RuntimeError: If the router is not running
+        """
+        if self._shutdown.is_set():
+            raise RuntimeError("Router is not running")
+        
+        self._count_request()
+    
     def _submit_request(
         self,
         request: WorkerRequest,
@@ -105,29 +239,123 @@ class Router:
             The result of the operation
             
         Raises:
-            RuntimeError: If the router is not running
+            RuntimeError: If the router is not running or is shutting down
             queue.Full: If the queue is full
             TimeoutError: If the operation times out
             Exception: If the operation fails
         """
-        if not self._running:
+        if self._shutdown.is_set():
             raise RuntimeError("Router is not running")
         
-        with self._lock:
-            self._total_requests += 1
+        self._count_request()
         
-        # Add request to queue
-        self.request_queue.put(request, timeout=timeout or 5.0)
+        inbox = self._inbox()
+        request.inbox = inbox
+        request.done = False
         
-        # Wait for completion
-        if not request.event.wait(timeout=timeout or 30.0):
-            raise TimeoutError("Operation timed out")
+        # Add request to the owning worker's queue
+        worker = self._worker_for(request)
+        worker.submit(request, timeout=timeout or 5.0)
+        
+        # stop() began after the check above; take the request back if
+        # no worker has picked it up, since it may never run
+        if self._shutdown.is_set() and worker.local_q.remove(request):
+            raise RuntimeError(_SHUTDOWN_ERROR)
+        
+        # Optionally spin on the done flag first so ops that finish in
+        # microseconds skip the Condition wait and its kernel sleep
+        for _ in range(self.spin_count):
+            if request.done:
+                break
+        
+        # Wait for completion. A timed-out request is never released, so
+        # a late completion only sets its flag and causes a spurious wakeup
+        if not request.done:
+            with inbox.lock:
+                if not inbox.cond.wait_for(
+                    lambda: request.done, timeout or 30.0
+                ):
+                    raise TimeoutError("Operation timed out")
+        
+        error = request.error
+        result = request.result
+        
+        # Completed and no longer referenced by any worker; recycle it
+        if request.callback is None:
+            request.release()
         
         # Check for errors
-        if request.error:
-            raise Exception(request.error)
+        if error == _SHUTDOWN_ERROR:
+            raise RuntimeError(error)
+        if error:
+            raise Exception(error)
+        
+        return result
+    
+    async def _submit_request_async(
+        self,
+        request: WorkerRequest,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Submit a request from a coroutine and await its result.
+        The worker resolves an asyncio future on the caller's loop, so no
+        executor thread or Condition wait is involved.
+        
+        Args:
+            request: The request to submit
+            timeout: Optional timeout in seconds
+            
+        Returns:
+            The result of the operation
+            
+        Raises:
+            RuntimeError: If the router is not running or is shutting down
+            queue.Full: If the queue is full
+            TimeoutError: If the operation times out
+            Exception: If the operation fails
+        """
+        if self._shutdown.is_set():
+            raise RuntimeError("Router is not running")
+        
+        self._count_request()
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request.loop = loop
+        request.future = future
+        
+        # Never block the event loop on a full queue; yield and retry
+        worker = self._worker_for(request)
+        deadline = loop.time() + (timeout or 5.0)
+        while True:
+            try:
+                worker.submit(request, timeout=0)
+                break
+            except queue.Full:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0)
+        
+        # Same race with stop() as in _submit_request
+        if self._shutdown.is_set() and worker.local_q.remove(request):
+            raise RuntimeError(_SHUTDOWN_ERROR)
+        
+        try:
+            await asyncio.wait_for(future, timeout or 30.0)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Operation timed out")
         
-        return request.result
+        error = request.error
+        result = request.result
+        request.release()
+        
+        if error == _SHUTDOWN_ERROR:
+            raise RuntimeError(error)
+        if error:
+            raise Exception(error)
+        
+        return result
     
     # Public API methods
     
@@ -137,13 +365,13 @@ class Router:
         
         Args:
             key: The key to retrieve
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             The value if found, None otherwise
         """
-        request = WorkerRequest(operation=OperationType.GET, key=key)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.get(key)
     
     def set(self, key: str, value: Any, timeout: Optional[float] = None) -> bool:
         """
@@ -157,7 +385,7 @@ class Router:
         Returns:
             True on success
         """
-        request = WorkerRequest(operation=OperationType.SET, key=key, value=value)
+        request = WorkerRequest.acquire(OperationType.SET, key=key, value=value)
         return self._submit_request(request, timeout)
     
     def delete(self, key: str, timeout: Optional[float] = None) -> bool:
@@ -171,7 +399,7 @@ class Router:
         Returns:
             True if the key existed and was deleted
         """
-        request = WorkerRequest(operation=OperationType.DELETE, key=key)
+        request = WorkerRequest.acquire(OperationType.DELETE, key=key)
         return self._submit_request(request, timeout)
     
     def exists(self, key: str, timeout: Optional[float] = None) -> bool:
@@ -180,92 +408,105 @@ class Router:
         
         Args:
             key: The key to check
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             True if the key exists
         """
-        request = WorkerRequest(operation=OperationType.EXISTS, key=key)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.exists(key)
     
     def keys(self, timeout: Optional[float] = None) -> List[str]:
         """
         Get all keys.
         
         Args:
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             List of all keys
         """
-        request = WorkerRequest(operation=OperationType.KEYS)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.keys()
     
     def values(self, timeout: Optional[float] = None) -> List[Any]:
         """
         Get all values.
         
         Args:
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             List of all values
         """
-        request = WorkerRequest(operation=OperationType.VALUES)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.values()
     
     def items(self, timeout: Optional[float] = None) -> List[tuple]:
         """
         Get all key-value pairs.
         
         Args:
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             List of (key, value) tuples
         """
-        request = WorkerRequest(operation=OperationType.ITEMS)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.items()
     
     def clear(self, timeout: Optional[float] = None) -> bool:
         """
         Clear all key-value pairs.
         
         Args:
-            timeout: Optional timeout in seconds
+            timeout: Unused; clear does not go through the worker pool
             
         Returns:
             True on success
         """
-        request = WorkerRequest(operation=OperationType.CLEAR)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        self.store.clear()
+        return True
     
     def size(self, timeout: Optional[float] = None) -> int:
         """
         Get the number of key-value pairs.
         
         Args:
-            timeout: Optional timeout in seconds
+            timeout: Unused; reads do not go through the worker pool
             
         Returns:
             Number of entries
         """
-        request = WorkerRequest(operation=OperationType.SIZE)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        return self.store.size()
+    
+    def size_fast(self) -> int:
+        """
+        Get the number of key-value pairs without going through a worker.
+        Cheap enough for health checks and metrics scrapes.
+        
+        Returns:
+            Number of entries
+        """
+        return self.store.size_fast()
     
     def update(self, data: Dict[str, Any], timeout: Optional[float] = None) -> bool:
         """
         Batch update multiple key-value pairs.
+        Applied directly with a single WAL write for the whole batch.
         
         Args:
             data: Dictionary of key-value pairs to set
-            timeout: Optional timeout in seconds
+            timeout: Unused; bulk updates do not go through the worker pool
             
         Returns:
             True on success
         """
-        request = WorkerRequest(operation=OperationType.UPDATE, data=data)
-        return self._submit_request(request, timeout)
+        self._begin_direct()
+        self.store.mset(data)
+        return True
     
     def checkpoint(self, timeout: Optional[float] = None) -> Dict[str, int]:
         """
@@ -277,27 +518,82 @@ class Router:
         Returns:
             Checkpoint statistics
         """
-        request = WorkerRequest(operation=OperationType.CHECKPOINT)
+        request = WorkerRequest.acquire(OperationType.CHECKPOINT)
         return self._submit_request(request, timeout)
     
+    # Asyncio API; same semantics as the blocking methods above
+    
+    async def aget(self, key: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Get a value by key from a coroutine.
+        Reads do not go through the worker pool, so this never waits.
+        
+        Args:
+            key: The key to retrieve
+            timeout: Unused; reads do not go through the worker pool
+            
+        Returns:
+            The value if found, None otherwise
+        """
+        self._begin_direct()
+        return self.store.get(key)
+    
+    async def aset(self, key: str, value: Any, timeout: Optional[float] = None) -> bool:
+        """
+        Set a key-value pair from a coroutine.
+        
+        Args:
+            key: The key to set
+            value: The value to set
+            timeout: Optional timeout in seconds
+            
+        Returns:
+            True on success
+        """
+        request = WorkerRequest.acquire(OperationType.SET, key=key, value=value)
+        return await self._submit_request_async(request, timeout)
+    
+    async def adelete(self, key: str, timeout: Optional[float] = None) -> bool:
+        """
+        Delete a key-value pair from a coroutine.
+        
+        Args:
+            key: The key to delete
+            timeout: Optional timeout in seconds
+            
+        Returns:
+            True if the key existed and was deleted
+        """
+        request = WorkerRequest.acquire(OperationType.DELETE, key=key)
+        return await self._submit_request_async(request, timeout)
+    
+    @property
+    def total_requests(self) -> int:
+        """Number of requests accepted so far (reading it changes nothing)."""
+        with self._counts_lock:
+            return self._retired_requests + sum(
+                count.value for count in self._request_counts
+            )
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         Get router and worker statistics.
+        Has no side effects and never blocks submitters: counters are read
+        while submitters and workers keep updating them (the count registry
+        lock is only contended by a thread's first request), so values may
+        be slightly stale rather than a consistent snapshot.
         
         Returns:
             Dictionary with statistics
         """
-        with self._lock:
-            stats = {
-                'running': self._running,
-                'total_requests': self._total_requests,
-                'num_workers': self.num_workers,
-                'queue_size': self.request_queue.qsize(),
-                'store_size': self.store.size(),
-                'workers': [worker.get_stats() for worker in self.workers]
-            }
-        
-        return stats
+        return {
+            'running': self.running,
+            'total_requests': self.total_requests,
+            'num_workers': self.num_workers,
+            'queue_size': sum(len(worker.local_q) for worker in self.workers),
+            'store_size': self.store.size_fast(),
+            'workers': [worker.get_stats() for worker in self.workers]
+        }
     
     def __enter__(self):
         """Context manager entry."""
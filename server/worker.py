@@ -3,32 +3,83 @@ Worker thread logic for processing client requests concurrently.
 Each worker handles operations on the key-value store.
 """
 
+import asyncio
+import logging
+import os
 import threading
 import queue
-from typing import Any, Dict, Optional, Callable
-from enum import Enum
-import traceback
-
-
-class OperationType(Enum):
-    """Types of operations supported by workers."""
-    GET = "GET"
-    SET = "SET"
-    DELETE = "DELETE"
-    EXISTS = "EXISTS"
-    KEYS = "KEYS"
-    VALUES = "VALUES"
-    ITEMS = "ITEMS"
-    CLEAR = "CLEAR"
-    SIZE = "SIZE"
-    UPDATE = "UPDATE"
-    CHECKPOINT = "CHECKPOINT"
-    SHUTDOWN = "SHUTDOWN"
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Callable
+from enum import IntEnum
+
+
+logger = logging.getLogger(__name__)
+
+# At most one logged traceback per worker per interval; the rest are counted
+_ERROR_LOG_INTERVAL = 1.0
+
+
+class OperationType(IntEnum):
+    """
+    Types of operations supported by workers.
+    Values index Worker's dispatch table, so keep them dense and in order.
+    """
+    GET = 0
+    SET = 1
+    DELETE = 2
+    EXISTS = 3
+    KEYS = 4
+    VALUES = 5
+    ITEMS = 6
+    CLEAR = 7
+    SIZE = 8
+    UPDATE = 9
+    CHECKPOINT = 10
+    SHUTDOWN = 11
+
+
+class _Inbox:
+    """
+    Wakeup signal owned by a single submitting thread.
+    Completion state lives on each request (WorkerRequest.done), so one
+    inbox serves any number of that thread's in-flight requests and no
+    synchronization primitive is allocated per request.
+    """
+    
+    __slots__ = ('lock', 'cond')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+    
+    def complete(self, request: 'WorkerRequest'):
+        """Mark request as done and wake the submitter to recheck it."""
+        with self.lock:
+            request.done = True
+            self.cond.notify_all()
+
+
+def _resolve_future(future: 'asyncio.Future'):
+    """Mark an asyncio submitter's future done; runs on its event loop."""
+    if not future.done():
+        future.set_result(None)
+
+
+# Per-thread freelists of WorkerRequest objects, see WorkerRequest.acquire()
+_request_pool = threading.local()
+_REQUEST_POOL_LIMIT = 64
 
 
 class WorkerRequest:
     """Represents a request to be processed by a worker."""
     
+    __slots__ = (
+        'operation', 'key', 'value', 'data', 'callback',
+        'result', 'error', 'done', 'inbox', 'loop', 'future'
+    )
+    
     def __init__(
         self,
         operation: OperationType,
@@ -54,34 +105,265 @@ class WorkerRequest:
         self.callback = callback
         self.result = None
         self.error = None
-        self.event = threading.Event()
+        self.done = False
+        self.inbox: Optional[_Inbox] = None
+        
+        # Set instead of inbox for asyncio submitters
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+    
+    @classmethod
+    def acquire(
+        cls,
+        operation: OperationType,
+        key: Optional[str] = None,
+        value: Optional[Any] = None,
+        data: Optional[Dict[str, Any]] = None
+    ) -> 'WorkerRequest':
+        """
+        Get a request from the calling thread's freelist, or create one.
+        
+        Args:
+            operation: The operation type to perform
+            key: Optional key for operations that need it
+            value: Optional value for SET operations
+            data: Optional data dict for UPDATE operations
+            
+        Returns:
+            A request ready to submit
+        """
+        free = getattr(_request_pool, 'free', None)
+        if not free:
+            return cls(operation, key, value, data)
+        
+        request = free.pop()
+        request.operation = operation
+        request.key = key
+        request.value = value
+        request.data = data
+        return request
+    
+    def release(self):
+        """
+        Reset this request and return it to the calling thread's freelist.
+        Only the submitter may call this, once the request has completed.
+        """
+        self.key = None
+        self.value = None
+        self.data = None
+        self.callback = None
+        self.result = None
+        self.error = None
+        self.done = False
+        self.inbox = None
+        self.loop = None
+        self.future = None
+        
+        free = getattr(_request_pool, 'free', None)
+        if free is None:
+            free = _request_pool.free = []
+        if len(free) < _REQUEST_POOL_LIMIT:
+            free.append(self)
+
+
+class RequestQueue:
+    """
+    Bounded multi-producer, multi-consumer request queue.
+    
+    append(), pop() and popleft() on a deque are single atomic operations
+    under the GIL, so producers, the owning worker and thieves never take a
+    lock to move requests. A lock is only used to park and wake the owner
+    when the queue is empty.
+    """
+    
+    def __init__(self, maxsize: int = 100):
+        """
+        Initialize the queue.
+        
+        Args:
+            maxsize: Maximum number of pending requests (approximate under
+                concurrent producers)
+        """
+        self.maxsize = maxsize
+        self._items: Deque['WorkerRequest'] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._parked = False
+        self._closed = False
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def put(self, request: 'WorkerRequest', timeout: Optional[float] = None):
+        """
+        Append a request, yielding the CPU while the queue is full.
+        
+        Args:
+            request: The request to enqueue
+            timeout: Seconds to wait for space (None waits forever)
+            
+        Raises:
+            queue.Full: If no space became available within the timeout
+        """
+        if len(self._items) >= self.maxsize:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while len(self._items) >= self.maxsize:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise queue.Full
+                time.sleep(0)
+        
+        self._items.append(request)
+        if self._parked:
+            self.wake()
+    
+    def remove(self, request: 'WorkerRequest') -> bool:
+        """
+        Withdraw a request that has not been taken yet.
+        
+        Returns:
+            True if the request was still queued and has been removed
+        """
+        try:
+            self._items.remove(request)
+            return True
+        except ValueError:
+            return False
+    
+    def put_many(self, requests: List['WorkerRequest']):
+        """Append requests without a capacity check (used for stolen work)."""
+        self._items.extend(requests)
+    
+    def get(self) -> Optional['WorkerRequest']:
+        """
+        Take the oldest request.
+        
+        Returns:
+            The request, or None if the queue is empty
+        """
+        try:
+            return self._items.popleft()
+        except IndexError:
+            return None
+    
+    def steal(self) -> List['WorkerRequest']:
+        """
+        Take up to half of the pending requests from the back.
+        Shutdown requests are never stolen.
+        
+        Returns:
+            Stolen requests, oldest first
+        """
+        stolen = []
+        for _ in range((len(self._items) + 1) // 2):
+            try:
+                request = self._items.pop()
+            except IndexError:
+                break
+            if request.operation == OperationType.SHUTDOWN:
+                # Put the shutdown back so the owning worker still sees it,
+                # wherever it sits (late submitters racing stop() can queue
+                # behind it); stop stealing at this point
+                self._items.append(request)
+                break
+            stolen.append(request)
+        stolen.reverse()
+        return stolen
+    
+    @property
+    def parked(self) -> bool:
+        """Whether the owning worker is blocked waiting for work."""
+        return self._parked
+    
+    def park(self, timeout: Optional[float] = None):
+        """
+        Block the owning worker until a request arrives, wake() or close()
+        is called, or the timeout expires.
+        """
+        with self._lock:
+            self._parked = True
+            try:
+                # Producers append before checking _parked, so re-check here
+                if not self._items and not self._closed:
+                    self._not_empty.wait(timeout)
+            finally:
+                self._parked = False
+    
+    def wake(self):
+        """Wake the owning worker if it is parked."""
+        with self._lock:
+            self._not_empty.notify()
+    
+    def close(self):
+        """Stop parking: wake the owner now and make later park() calls return."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
 
 
 class Worker:
     """
-    Worker thread that processes requests from a queue.
+    Worker thread that processes requests from its own local queue.
+    When the local queue runs dry, the worker steals from its peers.
     """
     
     def __init__(
         self,
         worker_id: int,
-        request_queue: queue.Queue,
-        store: Any  # KeyValueStore instance
+        store: Any,  # KeyValueStore instance
+        queue_size: int = 100,
+        batch_size: int = 1,
+        steal_threshold: int = 1,
+        cpu: Optional[int] = None
     ):
         """
         Initialize a worker thread.
         
         Args:
             worker_id: Unique identifier for this worker
-            request_queue: Queue to receive requests from
             store: The KeyValueStore instance to operate on
+            queue_size: Maximum number of pending requests in the local queue
+            batch_size: Max requests drained per wakeup; consecutive SETs in a
+                batch are applied with one store.mset() call (1 disables)
+            steal_threshold: Minimum backlog a peer must have before this
+                worker steals from it; higher values keep keys on their
+                home worker longer
+            cpu: CPU to pin the worker thread to (Linux only; None disables)
         """
         self.worker_id = worker_id
-        self.request_queue = request_queue
         self.store = store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.steal_threshold = steal_threshold
+        self.cpu = cpu
         self.thread: Optional[threading.Thread] = None
         self.running = False
         self.requests_processed = 0
+        self.requests_stolen = 0
+        self.errors = 0
+        self._last_error_log = 0.0
+        
+        # Local request queue; submitters append on the right, the owner
+        # pops from the left and thieves take from the right
+        self.local_q = RequestQueue(queue_size)
+        
+        # Other workers this one may steal from (set by the Router)
+        self.victims: List['Worker'] = []
+        
+        # Handlers indexed by OperationType value
+        self._dispatch = (
+            self._do_get,
+            self._do_set,
+            self._do_delete,
+            self._do_exists,
+            self._do_keys,
+            self._do_values,
+            self._do_items,
+            self._do_clear,
+            self._do_size,
+            self._do_update,
+            self._do_checkpoint,
+            self._do_shutdown,
+        )
     
     def start(self):
         """Start the worker thread."""
@@ -99,29 +381,252 @@ class Worker:
     def stop(self):
         """Stop the worker thread."""
         self.running = False
+        self.local_q.close()
         if self.thread:
             self.thread.join(timeout=5.0)
     
+    def fail_pending(self, error: str):
+        """
+        Complete every request still queued with an error.
+        Called after the thread has exited so no submitter waits forever
+        on a request that will never run.
+        
+        Args:
+            error: Error message to set on each request
+        """
+        request = self.local_q.get()
+        while request is not None:
+            if request.operation != OperationType.SHUTDOWN:
+                request.error = error
+                request.result = None
+                self._finish(request)
+            request = self.local_q.get()
+    
+    def submit(self, request: 'WorkerRequest', timeout: Optional[float] = None):
+        """
+        Add a request to this worker's local queue.
+        
+        Args:
+            request: The request to enqueue
+            timeout: Seconds to wait for space if the queue is full
+            
+        Raises:
+            queue.Full: If no space became available within the timeout
+        """
+        self.local_q.put(request, timeout)
+        
+        if len(self.local_q) > max(1, self.steal_threshold - 1):
+            # This worker is behind; nudge an idle peer to come and steal
+            for peer in self.victims:
+                if peer.local_q.parked:
+                    peer.local_q.wake()
+                    break
+    
+    def try_steal(self) -> List['WorkerRequest']:
+        """
+        Take up to half of the pending requests from the back of this queue.
+        Called by idle workers; shutdown requests are never stolen.
+        
+        Returns:
+            Stolen requests, oldest first
+        """
+        return self.local_q.steal()
+    
+    def _steal(self) -> Optional['WorkerRequest']:
+        """
+        Steal work from a random victim whose backlog has reached
+        steal_threshold.
+        
+        Returns:
+            The first stolen request; the rest are queued locally
+        """
+        for victim in random.sample(self.victims, len(self.victims)):
+            if len(victim.local_q) < self.steal_threshold:
+                continue
+            stolen = victim.try_steal()
+            if stolen:
+                self.requests_stolen += len(stolen)
+                if len(stolen) > 1:
+                    self.local_q.put_many(stolen[1:])
+                return stolen[0]
+        return None
+    
+    def _next_request(self) -> Optional['WorkerRequest']:
+        """
+        Get the next request: local queue first, then stealing.
+        Parks until woken when there is nothing to do.
+        
+        Returns:
+            A request, or None if none was available
+        """
+        request = self.local_q.get()
+        if request is not None:
+            return request
+        
+        if self.running:
+            request = self._steal()
+            if request is not None:
+                return request
+        
+        if self.running:
+            # Woken by a submit to this queue, a busy peer, or stop()
+            self.local_q.park()
+        return None
+    
+    def _pin_to_cpu(self):
+        """Bind the calling (worker) thread to self.cpu, where supported."""
+        if self.cpu is None or not hasattr(os, 'sched_setaffinity'):
+            return
+        try:
+            # pid 0 targets the calling thread
+            os.sched_setaffinity(0, {self.cpu})
+        except OSError:
+            # CPU not available to this process; run unpinned
+            self.cpu = None
+    
     def _run(self):
         """Main worker loop that processes requests."""
-        while self.running:
+        self._pin_to_cpu()
+        
+        # Hoisted out of the loop; each iteration would otherwise repeat
+        # these attribute lookups for what is often a single dict operation
+        next_request = self._next_request
+        process_request = self._process_request
+        batching = self.batch_size > 1
+        SET = OperationType.SET
+        
+        while True:
             try:
-                # Get request with timeout to allow checking running flag
-                request = self.request_queue.get(timeout=0.1)
+                # Local queue first, then steal or park
+                request = next_request()
+                if request is None:
+                    # Drain everything queued before honouring a stop
+                    if not self.running:
+                        break
+                    continue
                 
-                # Process the request
-                self._process_request(request)
-                self.requests_processed += 1
+                if batching and request.operation == SET:
+                    batch = self._drain(request)
+                    self._process_batch(batch)
+                    self.requests_processed += len(batch)
+                    continue
                 
-                # Mark task as done
-                self.request_queue.task_done()
+                process_request(request)
+                self.requests_processed += 1
                 
-            except queue.Empty:
+            except Exception:
+                # Count every error but rate-limit the logging, so a burst
+                # (e.g. disk full) can't stall the pool formatting tracebacks
+                self.errors += 1
+                now = time.monotonic()
+                if now - self._last_error_log >= _ERROR_LOG_INTERVAL:
+                    self._last_error_log = now
+                    logger.exception(
+                        "Worker %d error (%d so far)", self.worker_id, self.errors
+                    )
+    
+    def _drain(self, first: WorkerRequest) -> List[WorkerRequest]:
+        """
+        Collect up to batch_size requests, starting with first.
+        
+        Args:
+            first: Request already taken from the queue
+            
+        Returns:
+            The batch in queue order
+        """
+        batch = [first]
+        while len(batch) < self.batch_size:
+            request = self.local_q.get()
+            if request is None:
+                break
+            batch.append(request)
+        return batch
+    
+    def _process_batch(self, batch: List[WorkerRequest]):
+        """
+        Process a batch in order, fusing each run of consecutive SETs
+        into a single store.mset() call.
+        
+        Args:
+            batch: Requests in queue order
+        """
+        run: List[WorkerRequest] = []
+        for request in batch:
+            if request.operation == OperationType.SET:
+                run.append(request)
                 continue
+            self._flush_sets(run)
+            run = []
+            self._process_request(request)
+        self._flush_sets(run)
+    
+    def _flush_sets(self, run: List[WorkerRequest]):
+        """
+        Apply a run of SET requests with one store call.
+        
+        Args:
+            run: SET requests in queue order
+        """
+        if not run:
+            return
+        if len(run) == 1:
+            self._process_request(run[0])
+            return
+        
+        # Later SETs to the same key win, as if applied one by one
+        data = {request.key: request.value for request in run}
+        try:
+            self.store.mset(data)
+            error = None
+        except Exception as e:
+            error = str(e)
+        
+        for request in run:
+            request.error = error
+            request.result = True if error is None else None
+            self._finish(request)
+    
+    def _finish(self, request: WorkerRequest):
+        """
+        Signal completion of a request and run its callback.
+        
+        Args:
+            request: The processed request
+        """
+        # Signal completion
+        if request.inbox is not None:
+            request.inbox.complete(request)
+        elif request.future is not None:
+            try:
+                request.loop.call_soon_threadsafe(_resolve_future, request.future)
+            except RuntimeError:
+                # Event loop already closed; nobody is waiting any more
+                pass
+        
+        # Call callback if provided
+        if request.callback:
+            try:
+                request.callback(request)
             except Exception as e:
-                # Log error but keep worker running
-                print(f"Worker {self.worker_id} error: {e}")
-                traceback.print_exc()
+                logger.warning("Callback error: %s", e)
+    
+    def _lookup_handler(self, operation: int) -> Callable[[WorkerRequest], Any]:
+        """
+        Find the handler for an operation value.
+        Bounds-checked rather than relying on IndexError, since a negative
+        value would otherwise index from the end of the table.
+        
+        Args:
+            operation: OperationType value from a request
+            
+        Returns:
+            The handler, or _do_unknown for values outside the table
+        """
+        dispatch = self._dispatch
+        if isinstance(operation, int) and 0 <= operation < len(dispatch):
+            return dispatch[operation]
+        return self._do_unknown
     
     def _process_request(self, request: WorkerRequest):
         """
@@ -130,68 +635,62 @@ class Worker:
         Args:
             request: The request to process
         """
+        handler = self._lookup_handler(request.operation)
+        
         try:
-            # Handle shutdown specially
-            if request.operation == OperationType.SHUTDOWN:
-                self.running = False
-                request.result = True
-                request.event.set()
-                return
-            
-            # Execute the operation
-            if request.operation == OperationType.GET:
-                request.result = self.store.get(request.key)
-            
-            elif request.operation == OperationType.SET:
-                self.store.set(request.key, request.value)
-                request.result = True
-            
-            elif request.operation == OperationType.DELETE:
-                request.result = self.store.delete(request.key)
-            
-            elif request.operation == OperationType.EXISTS:
-                request.result = self.store.exists(request.key)
-            
-            elif request.operation == OperationType.KEYS:
-                request.result = self.store.keys()
-            
-            elif request.operation == OperationType.VALUES:
-                request.result = self.store.values()
-            
-            elif request.operation == OperationType.ITEMS:
-                request.result = self.store.items()
-            
-            elif request.operation == OperationType.CLEAR:
-                self.store.clear()
-                request.result = True
-            
-            elif request.operation == OperationType.SIZE:
-                request.result = self.store.size()
-            
-            elif request.operation == OperationType.UPDATE:
-                self.store.update(request.data)
-                request.result = True
-            
-            elif request.operation == OperationType.CHECKPOINT:
-                request.result = self.store.checkpoint()
-            
-            else:
-                request.error = f"Unknown operation: {request.operation}"
+            request.result = handler(request)
         
         except Exception as e:
             request.error = str(e)
             request.result = None
         
         finally:
-            # Signal completion
-            request.event.set()
-            
-            # Call callback if provided
-            if request.callback:
-                try:
-                    request.callback(request)
-                except Exception as e:
-                    print(f"Callback error: {e}")
+            self._finish(request)
+    
+    # Operation handlers; each returns the request's result
+    
+    def _do_get(self, request: WorkerRequest) -> Any:
+        return self.store.get(request.key)
+    
+    def _do_set(self, request: WorkerRequest) -> bool:
+        self.store.set(request.key, request.value)
+        return True
+    
+    def _do_delete(self, request: WorkerRequest) -> bool:
+        return self.store.delete(request.key)
+    
+    def _do_exists(self, request: WorkerRequest) -> bool:
+        return self.store.exists(request.key)
+    
+    def _do_keys(self, request: WorkerRequest) -> List[str]:
+        return self.store.keys()
+    
+    def _do_values(self, request: WorkerRequest) -> List[Any]:
+        return self.store.values()
+    
+    def _do_items(self, request: WorkerRequest) -> List[tuple]:
+        return self.store.items()
+    
+    def _do_clear(self, request: WorkerRequest) -> bool:
+        self.store.clear()
+        return True
+    
+    def _do_size(self, request: WorkerRequest) -> int:
+        return self.store.size()
+    
+    def _do_update(self, request: WorkerRequest) -> bool:
+        self.store.update(request.data)
+        return True
+    
+    def _do_checkpoint(self, request: WorkerRequest) -> Dict[str, int]:
+        return self.store.checkpoint()
+    
+    def _do_shutdown(self, request: WorkerRequest) -> bool:
+        self.running = False
+        return True
+    
+    def _do_unknown(self, request: WorkerRequest) -> None:
+        raise ValueError(f"Unknown operation: {request.operation}")
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -204,6 +703,10 @@ class Worker:
             'worker_id': self.worker_id,
             'running': self.running,
             'requests_processed': self.requests_processed,
+            'requests_stolen': self.requests_stolen,
+            'errors': self.errors,
+            'queue_depth': len(self.local_q),
+            'cpu': self.cpu,
             'thread_alive': self.thread.is_alive() if self.thread else False
         }
 
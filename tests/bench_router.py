@@ -0,0 +1,91 @@
+"""
+Router throughput benchmarks for MiniKV.
+Sweeps worker count and queue size with pytest-benchmark so queue and
+scheduling changes can be compared against saved runs.
+
+Run with:
+    python -m pytest tests/bench_router.py --benchmark-only
+"""
+
+import random
+import threading
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from server.router import Router
+
+
+NUM_CLIENTS = 16
+OPS_PER_CLIENT = 500
+NUM_KEYS = 100
+
+
+KEY_STRS = [f"key_{k}" for k in range(NUM_KEYS)]
+
+
+def _op_stream(seed: int):
+    """Pre-generate one client's (op, key, value) stream outside the timer."""
+    rng = random.Random(seed)
+    return list(zip(
+        rng.choices(range(4), k=OPS_PER_CLIENT),
+        rng.choices(KEY_STRS, k=OPS_PER_CLIENT),
+        rng.choices(range(1000), k=OPS_PER_CLIENT)
+    ))
+
+
+STREAMS = [_op_stream(seed) for seed in range(NUM_CLIENTS)]
+
+
+def _run_clients(router: Router):
+    """Run NUM_CLIENTS threads issuing a mixed set/get/delete/exists load."""
+    def client(stream):
+        for op, key, value in stream:
+            if op == 0:
+                router.set(key, value)
+            elif op == 1:
+                router.get(key)
+            elif op == 2:
+                router.delete(key)
+            else:
+                router.exists(key)
+    
+    threads = [
+        threading.Thread(target=client, args=(stream,))
+        for stream in STREAMS
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+@pytest.mark.benchmark(group="router")
+@pytest.mark.parametrize("queue_size", [16, 128, 1024])
+@pytest.mark.parametrize("num_workers", [1, 2, 4, 8, 16])
+def test_router_throughput(benchmark, num_workers, queue_size):
+    """Benchmark mixed client load through the router."""
+    router = Router(
+        num_workers=num_workers,
+        queue_size=queue_size,
+        enable_persistence=False,
+        enable_wal=False
+    )
+    router.start()
+    
+    try:
+        benchmark.pedantic(_run_clients, args=(router,), rounds=3, iterations=1)
+        
+        stats = router.get_stats()
+        total_ops = NUM_CLIENTS * OPS_PER_CLIENT
+        benchmark.extra_info['ops_per_sec'] = total_ops / benchmark.stats.stats.mean
+        
+        # Per-worker load shows whether scheduling is work-conserving
+        benchmark.extra_info['requests_processed'] = [
+            w['requests_processed'] for w in stats['workers']
+        ]
+        benchmark.extra_info['requests_stolen'] = [
+            w['requests_stolen'] for w in stats['workers']
+        ]
+    finally:
+        router.stop()
@@ -0,0 +1,25 @@
+"""
+Shared pytest configuration for MiniKV tests.
+Async fixtures live in test_distributed.py, the only suite that needs
+pytest-asyncio, so the unit suites run with plain pytest.
+"""
+
+import asyncio
+import pytest
+
+# uvloop is only available on Unix; fall back to the default loop without it
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_asyncio_loop_factories(config, item):
+    """
+    Run async tests on uvloop when it is installed (pytest-asyncio hook).
+    Load tests then measure the cluster rather than the client's event loop.
+    """
+    if uvloop is not None:
+        return {"uvloop": uvloop.new_event_loop}
+    return {"asyncio": asyncio.new_event_loop}
@@ -3,13 +3,16 @@ Concurrency tests for MiniKV.
 Tests thread safety, race conditions, and concurrent operations.
 """
 
+import asyncio
 import unittest
 import threading
+import queue
 import time
 import random
 from core.store import KeyValueStore
 from core.lock_manager import LockManager
 from server.router import Router
+from server.worker import Worker, WorkerRequest, OperationType, RequestQueue
 
 
 class TestLockManager(unittest.TestCase):
@@ -220,6 +223,143 @@ class TestConcurrentStore(unittest.TestCase):
         self.assertEqual(len(errors), 0)
 
 
+class TestWorkStealing(unittest.TestCase):
+    """Test per-worker queues and work stealing."""
+    
+    def test_try_steal_takes_back_half(self):
+        """Test that a thief takes the newest half, returned oldest first."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        victim = Worker(0, store)
+        
+        for i in range(4):
+            victim.submit(WorkerRequest(operation=OperationType.GET, key=f"key_{i}"))
+        
+        stolen = victim.try_steal()
+        self.assertEqual([r.key for r in stolen], ["key_2", "key_3"])
+        self.assertEqual(len(victim.local_q), 2)
+        self.assertEqual(victim.local_q.get().key, "key_0")
+        
+        store.close()
+    
+    def test_steal_respects_threshold(self):
+        """Test that idle workers leave short backlogs on their home worker."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        victim = Worker(0, store)
+        thief = Worker(1, store, steal_threshold=3)
+        thief.victims = [victim]
+        
+        victim.submit(WorkerRequest(operation=OperationType.GET, key="key_0"))
+        victim.submit(WorkerRequest(operation=OperationType.GET, key="key_1"))
+        self.assertIsNone(thief._steal())
+        
+        victim.submit(WorkerRequest(operation=OperationType.GET, key="key_2"))
+        self.assertEqual(thief._steal().key, "key_1")
+        self.assertEqual(len(thief.local_q), 1)
+        self.assertEqual(len(victim.local_q), 1)
+        
+        store.close()
+    
+    def test_queue_put_times_out_when_full(self):
+        """Test that a full request queue rejects puts after the timeout."""
+        request_queue = RequestQueue(maxsize=2)
+        request_queue.put(WorkerRequest(operation=OperationType.GET, key="a"))
+        request_queue.put(WorkerRequest(operation=OperationType.GET, key="b"))
+        
+        with self.assertRaises(queue.Full):
+            request_queue.put(
+                WorkerRequest(operation=OperationType.GET, key="c"),
+                timeout=0.01
+            )
+        
+        self.assertEqual(request_queue.get().key, "a")
+        self.assertEqual(len(request_queue), 1)
+    
+    def test_try_steal_skips_shutdown(self):
+        """Test that shutdown requests stay with their worker."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        victim = Worker(0, store)
+        
+        victim.submit(WorkerRequest(operation=OperationType.GET, key="key_0"))
+        victim.submit(WorkerRequest(operation=OperationType.SHUTDOWN))
+        
+        self.assertEqual(victim.try_steal(), [])
+        self.assertEqual(len(victim.local_q), 2)
+        
+        store.close()
+
+
+class TestWorkerBatching(unittest.TestCase):
+    """Test that workers fuse queued SETs into batched store writes."""
+    
+    def test_queued_sets_are_batched(self):
+        """Test that SETs queued before the worker starts land in order."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        worker = Worker(0, store, batch_size=8)
+        
+        requests = [
+            WorkerRequest(operation=OperationType.SET, key="a", value=1),
+            WorkerRequest(operation=OperationType.SET, key="b", value=2),
+            WorkerRequest(operation=OperationType.DELETE, key="a"),
+            WorkerRequest(operation=OperationType.SET, key="b", value=3),
+            WorkerRequest(operation=OperationType.SET, key="c", value=4),
+        ]
+        for request in requests:
+            worker.submit(request)
+        worker.submit(WorkerRequest(operation=OperationType.SHUTDOWN))
+        
+        worker.start()
+        worker.thread.join(timeout=5.0)
+        
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("b"), 3)
+        self.assertEqual(store.get("c"), 4)
+        self.assertEqual(worker.requests_processed, len(requests) + 1)
+        self.assertTrue(requests[2].result)
+        
+        store.close()
+    
+    def test_unknown_operation_sets_error(self):
+        """Test that an unknown operation fails the request, not the worker."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        worker = Worker(0, store)
+        
+        bad = WorkerRequest(operation=99, key="a")
+        negative = WorkerRequest(operation=-1, key="a")
+        worker.submit(bad)
+        worker.submit(negative)
+        worker.submit(WorkerRequest(operation=OperationType.SET, key="a", value=1))
+        worker.submit(WorkerRequest(operation=OperationType.SHUTDOWN))
+        
+        worker.start()
+        worker.thread.join(timeout=5.0)
+        
+        self.assertIn("Unknown operation", bad.error)
+        self.assertIn("Unknown operation", negative.error)
+        self.assertEqual(store.get("a"), 1)
+        self.assertEqual(worker.errors, 0)
+        
+        store.close()
+    
+    def test_fail_pending_after_shutdown(self):
+        """Test that requests queued behind a shutdown are failed, not lost."""
+        store = KeyValueStore(persistence=None, enable_wal=False)
+        worker = Worker(0, store)
+        
+        worker.submit(WorkerRequest(operation=OperationType.SHUTDOWN))
+        late = WorkerRequest(operation=OperationType.SET, key="a", value=1)
+        
+        worker.start()
+        worker.thread.join(timeout=5.0)
+        worker.submit(late)
+        worker.fail_pending("Router is shutting down")
+        
+        self.assertEqual(late.error, "Router is shutting down")
+        self.assertEqual(len(worker.local_q), 0)
+        self.assertIsNone(store.get("a"))
+        
+        store.close()
+
+
 class TestConcurrentRouter(unittest.TestCase):
     """Test concurrent operations through the router."""
     
@@ -286,19 +426,28 @@ class TestConcurrentRouter(unittest.TestCase):
         operations = 100
         errors = []
         
-        def stress_client():
+        # Pre-generate each client's op stream so the timed loop measures the
+        # router rather than random number generation and string formatting
+        key_strs = [f"key_{k}" for k in range(101)]
+        streams = []
+        for seed in range(num_clients):
+            rng = random.Random(seed)
+            streams.append(list(zip(
+                rng.choices(range(4), k=operations),
+                rng.choices(key_strs, k=operations),
+                rng.choices(range(1001), k=operations)
+            )))
+        
+        def stress_client(stream):
             try:
-                for _ in range(operations):
-                    op = random.choice(['set', 'get', 'delete', 'exists'])
-                    key = f"key_{random.randint(0, 100)}"
-                    
-                    if op == 'set':
-                        self.router.set(key, random.randint(0, 1000))
-                    elif op == 'get':
+                for op, key, value in stream:
+                    if op == 0:
+                        self.router.set(key, value)
+                    elif op == 1:
                         self.router.get(key)
-                    elif op == 'delete':
+                    elif op == 2:
                         self.router.delete(key)
-                    elif op == 'exists':
+                    else:
                         self.router.exists(key)
             except Exception as e:
                 errors.append(e)
@@ -306,8 +455,8 @@ class TestConcurrentRouter(unittest.TestCase):
         threads = []
         start_time = time.time()
         
-        for _ in range(num_clients):
-            t = threading.Thread(target=stress_client)
+        for stream in streams:
+            t = threading.Thread(target=stress_client, args=(stream,))
             threads.append(t)
             t.start()
         
@@ -324,6 +473,150 @@ class TestConcurrentRouter(unittest.TestCase):
         # Should have no errors
         self.assertEqual(len(errors), 0)
     
+    def test_requests_are_recycled(self):
+        """Test that completed requests return to the submitter's freelist."""
+        request = WorkerRequest.acquire(OperationType.GET, key="other")
+        request.release()
+        
+        # The freelist is LIFO, so set() reuses the released request and,
+        # once it completes, puts the same object back on top
+        self.assertTrue(self.router.set("key", 1))
+        
+        reused = WorkerRequest.acquire(OperationType.GET, key="again")
+        self.assertIs(reused, request)
+        self.assertEqual(reused.key, "again")
+        self.assertIsNone(reused.result)
+        reused.release()
+        
+        self.router.set("key", 2)
+        self.assertEqual(self.router.get("key"), 2)
+    
+    def test_update_and_clear(self):
+        """Test bulk update and clear through the router."""
+        self.router.update({f"key_{i}": i for i in range(20)})
+        self.assertEqual(self.router.size(), 20)
+        self.assertEqual(self.router.get("key_7"), 7)
+        
+        self.assertTrue(self.router.clear())
+        self.assertEqual(self.router.size(), 0)
+    
+    def test_size_fast_matches_size(self):
+        """Test that the lock-free size agrees with the worker-routed size."""
+        for i in range(50):
+            self.router.set(f"key_{i}", i)
+        self.router.delete("key_0")
+        
+        self.assertEqual(self.router.size_fast(), 49)
+        self.assertEqual(self.router.size_fast(), self.router.size())
+    
+    def test_requests_rejected_after_stop(self):
+        """Test that submitting to a stopped router raises immediately."""
+        self.router.set("key_0", 0)
+        self.router.stop()
+        
+        self.assertFalse(self.router.get_stats()['running'])
+        with self.assertRaises(RuntimeError):
+            self.router.set("key_1", 1)
+        with self.assertRaises(RuntimeError):
+            self.router.get("key_0")
+    
+    def test_async_api(self):
+        """Test the asyncio methods, including many writes in flight at once."""
+        async def run():
+            self.assertTrue(await self.router.aset("a", 1))
+            self.assertEqual(await self.router.aget("a"), 1)
+            
+            results = await asyncio.gather(
+                *(self.router.aset(f"key_{i}", i) for i in range(200))
+            )
+            self.assertTrue(all(results))
+            
+            self.assertTrue(await self.router.adelete("a"))
+            self.assertFalse(await self.router.adelete("a"))
+        
+        asyncio.run(run())
+        self.assertEqual(self.router.size(), 200)
+        self.assertEqual(self.router.get("key_199"), 199)
+    
+    def test_total_requests_under_concurrent_reads(self):
+        """Test that reading the request count never disturbs it."""
+        num_clients = 8
+        operations_per_client = 100
+        stop = threading.Event()
+        readings = [[] for _ in range(2)]
+        
+        def client_operations(client_id):
+            for i in range(operations_per_client):
+                self.router.set(f"client_{client_id}_key_{i}", i)
+        
+        def monitor(seen):
+            while not stop.is_set():
+                seen.append(self.router.total_requests)
+                time.sleep(0.001)
+        
+        monitors = [threading.Thread(target=monitor, args=(seen,)) for seen in readings]
+        clients = [
+            threading.Thread(target=client_operations, args=(i,))
+            for i in range(num_clients)
+        ]
+        for thread in monitors + clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        stop.set()
+        for thread in monitors:
+            thread.join()
+        
+        total = num_clients * operations_per_client
+        self.assertEqual(self.router.total_requests, total)
+        
+        # Each monitor saw the count only grow, and never past the total
+        for seen in readings:
+            self.assertEqual(seen, sorted(seen))
+            self.assertTrue(all(0 <= value <= total for value in seen))
+    
+    def test_request_counts_survive_thread_churn(self):
+        """Test that exited submitter threads don't accumulate counters."""
+        for round_number in range(20):
+            threads = [
+                threading.Thread(
+                    target=self.router.set,
+                    args=(f"key_{round_number}_{i}", i)
+                )
+                for i in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        # One more registration prunes the last round's counters
+        self.router.set("main", 0)
+        
+        self.assertEqual(self.router.total_requests, 101)
+        self.assertLessEqual(len(self.router._request_counts), 6)
+    
+    def test_positional_arguments(self):
+        """Test that tuning options don't shift the original positional API."""
+        router = Router(2, 10, False, False)
+        
+        self.assertEqual(router.num_workers, 2)
+        self.assertIsNone(router.store._persistence)
+        self.assertIsNone(router.store._wal)
+        
+        with self.assertRaises(TypeError):
+            Router(2, 10, False, False, "minikv.db", "minikv.wal", 32)
+    
+    def test_spin_before_wait(self):
+        """Test that results are still delivered when submitters spin first."""
+        self.router.spin_count = 1000
+        
+        for i in range(50):
+            self.assertTrue(self.router.set(f"key_{i}", i))
+        self.assertTrue(self.router.delete("key_0"))
+        self.assertFalse(self.router.delete("key_0"))
+        self.assertEqual(self.router.size(), 49)
+    
     def test_worker_pool_utilization(self):
         """Test that all workers are being utilized."""
         num_operations = 100
@@ -342,6 +635,11 @@ class TestConcurrentRouter(unittest.TestCase):
         
         self.assertEqual(total_processed, num_operations)
         
+        # Every submitted request is counted, and reading the count
+        # does not change it
+        self.assertEqual(stats['total_requests'], num_operations)
+        self.assertEqual(self.router.total_requests, num_operations)
+        
         # Verify workers are alive
         for worker in stats['workers']:
             self.assertTrue(worker['thread_alive'])
@@ -354,6 +652,8 @@ def run_tests():
     
     suite.addTests(loader.loadTestsFromTestCase(TestLockManager))
     suite.addTests(loader.loadTestsFromTestCase(TestConcurrentStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestWorkStealing))
+    suite.addTests(loader.loadTestsFromTestCase(TestWorkerBatching))
     suite.addTests(loader.loadTestsFromTestCase(TestConcurrentRouter))
     
     runner = unittest.TextTestRunner(verbosity=2)
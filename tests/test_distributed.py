@@ -13,207 +13,337 @@ Tests:
 import pytest
 import asyncio
 import httpx
+import msgspec
+import os
+import signal
 import subprocess
+import sys
 import time
 import random
-from typing import Dict, List
+from functools import partial
+from typing import Awaitable, Callable, Dict, List
+
+# loop_scope needs pytest-asyncio 0.24+; skip this module (not the unit
+# suites, which don't need the plugin) when it isn't available
+pytest_asyncio = pytest.importorskip("pytest_asyncio", minversion="0.24")
+
+# HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 without it.
+# httpx only negotiates HTTP/2 via TLS ALPN, and uvicorn does not serve
+# cleartext h2c, so against the plain-http gateway this stays HTTP/1.1 and
+# concurrency comes from the connection pool (hence its generous limits).
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Tests share the module-scoped client fixture, so they share its loop too
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+GATEWAY_URL = "http://localhost:8000"
+
+# Seed for the request mix in load-style tests, so runs are comparable
+RNG_SEED = 0xC0FFEE
+
+# Request bodies for write-heavy tests are pre-encoded with msgspec (already
+# a server dependency), which is faster than httpx's stdlib json encoding
+encode_json = msgspec.json.encode
+JSON_HEADERS = {"content-type": "application/json"}
+
+# Cap on requests in flight at once; keeps concurrent tests from queueing
+# on the client's connection pool and timing out there instead of on the server
+MAX_IN_FLIGHT = 256
+
+
+async def bounded(
+    sem: asyncio.Semaphore,
+    request: Callable[[], Awaitable[httpx.Response]]
+) -> httpx.Response:
+    """
+    Run a request while holding a semaphore slot.
+    Failures are not retried, so server timeouts still count against the
+    success-rate and throughput assertions.
+    
+    Args:
+        sem: Semaphore bounding concurrent requests
+        request: Zero-argument callable that starts the request
+        
+    Returns:
+        The response
+    """
+    async with sem:
+        return await request()
+
+
+async def wait_until(
+    predicate: Callable[[], Awaitable[bool]],
+    timeout: float = 5.0,
+    interval: float = 0.05
+) -> bool:
+    """
+    Poll an async predicate until it holds or the timeout expires.
+    Used instead of fixed sleeps while waiting for replication to converge.
+    
+    Args:
+        predicate: Zero-argument coroutine function returning True when done
+        timeout: Seconds to keep polling
+        interval: Seconds between polls
+        
+    Returns:
+        True if the predicate held before the deadline
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+
+async def read_with_retry(
+    client: httpx.AsyncClient,
+    key: str,
+    expected: str,
+    attempts: int = 20,
+    interval: float = 0.05
+) -> httpx.Response:
+    """
+    GET a key until it returns the expected value or attempts run out.
+    Used instead of a fixed sleep between a write and the read checking it.
+    
+    Args:
+        client: Client pointed at the gateway
+        key: Key to read
+        expected: Value the read should eventually return
+        attempts: Number of GETs before giving up
+        interval: Seconds between GETs
+        
+    Returns:
+        The last response, for the caller to assert on
+    """
+    for attempt in range(attempts):
+        response = await client.get(f"/get/{key}")
+        if response.status_code == 200 and response.json().get("value") == expected:
+            break
+        if attempt < attempts - 1:
+            await asyncio.sleep(interval)
+    return response
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client():
+    """
+    One pooled HTTP client per test module, pointed at the gateway.
+    Reusing it avoids a new connection pool (and handshakes) per test.
+    """
+    async with httpx.AsyncClient(
+        base_url=GATEWAY_URL,
+        http2=HTTP2,
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=500),
+        timeout=10.0
+    ) as c:
+        yield c
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def cluster_status(client):
+    """
+    Cluster status fetched once and shared by tests that only read it.
+    Tests checking live status (e.g. after killing a node) query it themselves.
+    """
+    response = await client.get("/cluster/status")
+    assert response.status_code == 200
+    return response.json()
 
 
 class TestDistributedCluster:
     """Test suite for distributed cluster functionality"""
     
-    GATEWAY_URL = "http://localhost:8000"
     NODE_URLS = {
         1: "http://localhost:8001",
         2: "http://localhost:8002",
         3: "http://localhost:8003"
     }
     
-    @pytest.mark.asyncio
-    async def test_cluster_health(self):
+    async def test_cluster_health(self, cluster_status):
         """Test that all nodes are healthy"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.GATEWAY_URL}/cluster/status", timeout=5.0)
-            assert response.status_code == 200
-            
-            status = response.json()
-            assert status["cluster_size"] == 3
-            assert status["healthy_nodes"] >= 2  # At least majority healthy
+        assert cluster_status["cluster_size"] == 3
+        assert cluster_status["healthy_nodes"] >= 2  # At least majority healthy
     
-    @pytest.mark.asyncio
-    async def test_basic_operations(self):
+    async def test_basic_operations(self, client):
         """Test basic SET/GET operations through gateway"""
-        async with httpx.AsyncClient() as client:
-            # SET operation
-            response = await client.post(
-                f"{self.GATEWAY_URL}/set/test_key",
-                json={"value": "test_value"},
-                timeout=5.0
-            )
-            assert response.status_code == 200
-            
-            # GET operation
-            response = await client.get(f"{self.GATEWAY_URL}/get/test_key", timeout=5.0)
-            assert response.status_code == 200
-            
-            data = response.json()
-            assert data["value"] == "test_value"
+        # SET operation
+        response = await client.post(
+            "/set/test_key",
+            json={"value": "test_value"}
+        )
+        assert response.status_code == 200
+        
+        # GET operation
+        response = await read_with_retry(client, "test_key", "test_value")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["value"] == "test_value"
     
-    @pytest.mark.asyncio
-    async def test_data_replication(self):
+    async def test_data_replication(self, client):
         """Test that data is replicated to multiple nodes"""
-        async with httpx.AsyncClient() as client:
-            # Write through gateway
-            test_key = f"repl_test_{random.randint(0, 1000000)}"
-            test_value = f"replicated_value_{random.randint(0, 1000000)}"
-            
-            await client.post(
-                f"{self.GATEWAY_URL}/set/{test_key}",
-                json={"value": test_value},
-                timeout=5.0
-            )
-            
-            # Wait for replication
-            await asyncio.sleep(2)
+        # Write through gateway
+        test_key = f"repl_test_{random.randint(0, 1000000)}"
+        test_value = f"replicated_value_{random.randint(0, 1000000)}"
+        
+        await client.post(
+            f"/set/{test_key}",
+            json={"value": test_value}
+        )
+        
+        async def count_replicas() -> int:
+            # Query every node at once; a down node shows up as an exception
+            responses = await asyncio.gather(*[
+                client.get(f"{node_url}/get/{test_key}", timeout=2.0)
+                for node_url in self.NODE_URLS.values()
+            ], return_exceptions=True)
             
-            # Check that at least 2 nodes have the data (N=2 replication)
             nodes_with_data = 0
-            for node_id, node_url in self.NODE_URLS.items():
+            for response in responses:
+                if isinstance(response, Exception) or response.status_code != 200:
+                    continue
                 try:
-                    response = await client.get(f"{node_url}/get/{test_key}", timeout=2.0)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get("value") == test_value:
-                            nodes_with_data += 1
-                except Exception:
+                    if response.json().get("value") == test_value:
+                        nodes_with_data += 1
+                except ValueError:
                     pass
-            
-            assert nodes_with_data >= 2, f"Expected at least 2 replicas, found {nodes_with_data}"
+            return nodes_with_data
+        
+        async def replicated() -> bool:
+            return await count_replicas() >= 2
+        
+        # Wait for replication
+        await wait_until(replicated)
+        
+        # Check that at least 2 nodes have the data (N=2 replication)
+        nodes_with_data = await count_replicas()
+        assert nodes_with_data >= 2, f"Expected at least 2 replicas, found {nodes_with_data}"
     
-    @pytest.mark.asyncio
-    async def test_consistent_hashing_distribution(self):
+    async def test_consistent_hashing_distribution(self, client):
         """Test that keys are distributed across nodes"""
-        async with httpx.AsyncClient() as client:
-            # Write many keys
-            num_keys = 100
-            for i in range(num_keys):
-                await client.post(
-                    f"{self.GATEWAY_URL}/set/dist_key_{i}",
-                    json={"value": f"value_{i}"},
-                    timeout=5.0
-                )
-            
-            await asyncio.sleep(2)
-            
-            # Check distribution across nodes
-            response = await client.get(
-                f"{self.GATEWAY_URL}/cluster/distribution",
-                timeout=10.0
-            )
-            
+        # Write many keys
+        num_keys = 100
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+        await asyncio.gather(*[
+            bounded(sem, partial(client.post, f"/set/dist_key_{i}", json={"value": f"value_{i}"}))
+            for i in range(num_keys)
+        ], return_exceptions=True)
+        
+        async def all_nodes_have_keys() -> bool:
+            response = await client.get("/cluster/distribution")
             distribution = response.json()
-            
-            # Each node should have some keys (not perfectly balanced, but distributed)
-            for node_id in [1, 2, 3]:
-                node_key = f"node_{node_id}"
-                if node_key in distribution:
-                    key_count = distribution[node_key].get("key_count", 0)
-                    # With 100 keys and consistent hashing, each should get ~20-50 keys
-                    assert key_count > 0, f"Node {node_id} has no keys"
+            return all(
+                distribution.get(f"node_{node_id}", {}).get("key_count", 0) > 0
+                for node_id in [1, 2, 3]
+            )
+        
+        await wait_until(all_nodes_have_keys)
+        
+        # Check distribution across nodes
+        response = await client.get("/cluster/distribution")
+        distribution = response.json()
+        
+        # Each node should have some keys (not perfectly balanced, but distributed)
+        for node_id in [1, 2, 3]:
+            node_key = f"node_{node_id}"
+            if node_key in distribution:
+                key_count = distribution[node_key].get("key_count", 0)
+                # With 100 keys and consistent hashing, each should get ~20-50 keys
+                assert key_count > 0, f"Node {node_id} has no keys"
     
-    @pytest.mark.asyncio
-    async def test_failover_to_replica(self):
+    async def test_failover_to_replica(self, client):
         """Test failover: read from replica if primary is down"""
         # This test assumes you can simulate node failure
         # For manual testing: kill one node and verify reads still work
         
-        async with httpx.AsyncClient() as client:
-            # Write a key
-            test_key = "failover_test"
-            await client.post(
-                f"{self.GATEWAY_URL}/set/{test_key}",
-                json={"value": "failover_value"},
-                timeout=5.0
-            )
-            
-            await asyncio.sleep(2)
-            
-            # Should be able to read even if one node is down
-            # (This test works best when manually killing a node)
-            response = await client.get(f"{self.GATEWAY_URL}/get/{test_key}", timeout=5.0)
-            
-            # Should succeed (failover to replica)
-            assert response.status_code == 200
+        # Write a key
+        test_key = "failover_test"
+        await client.post(
+            f"/set/{test_key}",
+            json={"value": "failover_value"}
+        )
+        
+        # Should be able to read even if one node is down
+        # (This test works best when manually killing a node)
+        response = await read_with_retry(client, test_key, "failover_value")
+        
+        # Should succeed (failover to replica)
+        assert response.status_code == 200
     
-    @pytest.mark.asyncio
-    async def test_concurrent_writes(self):
+    async def test_concurrent_writes(self, client):
         """Test concurrent writes from multiple clients"""
-        async with httpx.AsyncClient() as client:
-            # Write many keys concurrently
-            tasks = []
-            for i in range(100):
-                task = client.post(
-                    f"{self.GATEWAY_URL}/set/concurrent_{i}",
-                    json={"value": f"value_{i}"},
-                    timeout=10.0
-                )
-                tasks.append(task)
-            
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Most requests should succeed
-            successes = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code == 200)
-            success_rate = successes / len(tasks)
-            
-            assert success_rate >= 0.95, f"Success rate too low: {success_rate:.2%}"
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+        
+        # Write many keys concurrently
+        tasks = []
+        for i in range(100):
+            task = bounded(sem, partial(
+                client.post,
+                f"/set/concurrent_{i}",
+                content=encode_json({"value": f"value_{i}"}),
+                headers=JSON_HEADERS
+            ))
+            tasks.append(task)
+        
+        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Most requests should succeed
+        successes = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code == 200)
+        success_rate = successes / len(tasks)
+        
+        assert success_rate >= 0.95, f"Success rate too low: {success_rate:.2%}"
     
-    @pytest.mark.asyncio
-    async def test_concurrent_reads(self):
+    async def test_concurrent_reads(self, client):
         """Test concurrent reads from multiple clients"""
-        async with httpx.AsyncClient() as client:
-            # Pre-populate data
-            for i in range(10):
-                await client.post(
-                    f"{self.GATEWAY_URL}/set/read_test_{i}",
-                    json={"value": f"value_{i}"},
-                    timeout=5.0
-                )
-            
-            await asyncio.sleep(1)
-            
-            # Concurrent reads
-            tasks = []
-            for _ in range(200):
-                key_id = random.randint(0, 9)
-                task = client.get(f"{self.GATEWAY_URL}/get/read_test_{key_id}", timeout=10.0)
-                tasks.append(task)
-            
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # All reads should succeed
-            successes = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code == 200)
-            success_rate = successes / len(tasks)
-            
-            assert success_rate >= 0.98, f"Read success rate too low: {success_rate:.2%}"
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+        
+        # Pre-populate data
+        await asyncio.gather(*[
+            bounded(sem, partial(client.post, f"/set/read_test_{i}", json={"value": f"value_{i}"}))
+            for i in range(10)
+        ], return_exceptions=True)
+        
+        await asyncio.gather(*[
+            bounded(sem, partial(read_with_retry, client, f"read_test_{i}", f"value_{i}"))
+            for i in range(10)
+        ], return_exceptions=True)
+        
+        # Concurrent reads
+        rng = random.Random(RNG_SEED)
+        tasks = []
+        for _ in range(200):
+            key_id = rng.randrange(10)
+            task = bounded(sem, partial(client.get, f"/get/read_test_{key_id}"))
+            tasks.append(task)
+        
+        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # All reads should succeed
+        successes = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code == 200)
+        success_rate = successes / len(tasks)
+        
+        assert success_rate >= 0.98, f"Read success rate too low: {success_rate:.2%}"
     
-    @pytest.mark.asyncio
-    async def test_gateway_stats(self):
+    async def test_gateway_stats(self, client):
         """Test gateway statistics endpoint"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.GATEWAY_URL}/stats", timeout=5.0)
-            assert response.status_code == 200
-            
-            stats = response.json()
-            assert "gateway" in stats
-            assert "cluster" in stats
-            assert stats["cluster"]["total_nodes"] == 3
+        response = await client.get("/stats")
+        assert response.status_code == 200
+        
+        stats = response.json()
+        assert "gateway" in stats
+        assert "cluster" in stats
+        assert stats["cluster"]["total_nodes"] == 3
 
 
 class TestChaos:
     """Chaos engineering tests (requires manual node control)"""
     
-    GATEWAY_URL = "http://localhost:8000"
-    
     def _kill_node(self, node_id: int):
         """Kill a specific node process"""
         try:
@@ -221,8 +351,8 @@ class TestChaos:
             with open(f".minikv_node{node_id}.pid", "r") as f:
                 pid = int(f.read().strip())
             
-            # Kill process
-            subprocess.run(["kill", str(pid)], check=False)
+            # Kill process (signal it directly rather than spawning `kill`)
+            os.kill(pid, signal.SIGTERM)
             print(f"Killed node {node_id} (PID: {pid})")
             return True
         except Exception as e:
@@ -234,7 +364,7 @@ class TestChaos:
         try:
             # Start node in background
             process = subprocess.Popen(
-                ["python3", "-m", "distributed.node_server", str(node_id), str(port)],
+                [sys.executable, "-m", "distributed.node_server", str(node_id), str(port)],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
@@ -249,88 +379,109 @@ class TestChaos:
             print(f"Failed to start node {node_id}: {e}")
             return False
     
-    @pytest.mark.asyncio
     @pytest.mark.skip(reason="Requires manual cluster setup")
-    async def test_node_crash_recovery(self):
+    async def test_node_crash_recovery(self, client):
         """Test that cluster survives node crash"""
-        async with httpx.AsyncClient() as client:
-            # Write some data
-            await client.post(
-                f"{self.GATEWAY_URL}/set/crash_test",
-                json={"value": "crash_value"},
-                timeout=5.0
-            )
-            
-            # Kill node 1
-            self._kill_node(1)
-            
-            # Wait for health check to detect failure
-            await asyncio.sleep(10)
-            
-            # Should still be able to read (from replica)
-            response = await client.get(f"{self.GATEWAY_URL}/get/crash_test", timeout=5.0)
-            assert response.status_code == 200
-            assert response.json()["value"] == "crash_value"
-            
-            # Restart node 1
-            self._start_node(1, 8001)
-            
-            # Wait for node to recover
-            await asyncio.sleep(5)
-            
-            # Verify cluster is healthy again
-            response = await client.get(f"{self.GATEWAY_URL}/cluster/status", timeout=5.0)
-            status = response.json()
-            assert status["healthy_nodes"] >= 2
+        # Write some data
+        await client.post(
+            "/set/crash_test",
+            json={"value": "crash_value"}
+        )
+        
+        # Kill node 1
+        self._kill_node(1)
+        
+        # Wait for health check to detect failure
+        await asyncio.sleep(10)
+        
+        # Should still be able to read (from replica)
+        response = await client.get("/get/crash_test")
+        assert response.status_code == 200
+        assert response.json()["value"] == "crash_value"
+        
+        # Restart node 1
+        self._start_node(1, 8001)
+        
+        # Wait for node to recover
+        await asyncio.sleep(5)
+        
+        # Verify cluster is healthy again
+        response = await client.get("/cluster/status")
+        status = response.json()
+        assert status["healthy_nodes"] >= 2
 
 
 # Performance test
-@pytest.mark.asyncio
-async def test_throughput_target():
+async def test_throughput_target(client):
     """Test that cluster meets 250K ops/sec target"""
     # This is a quick check - run full benchmark for accurate results
-    gateway_url = "http://localhost:8000"
+    rng = random.Random(RNG_SEED)
+    sem = asyncio.Semaphore(MAX_IN_FLIGHT)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # Warm up
-        for i in range(100):
-            await client.post(
-                f"{gateway_url}/set/warmup_{i}",
-                json={"value": f"value_{i}"}
-            )
-        
-        # Measure throughput for 10 seconds
-        start_time = time.time()
-        operations = 0
-        duration = 10.0
-        
-        while time.time() - start_time < duration:
-            tasks = []
-            for i in range(100):  # Batch of 100
-                key = f"perf_test_{random.randint(0, 10000)}"
-                value = f"value_{random.randint(0, 1000000)}"
-                
-                if random.random() < 0.8:
-                    # 80% reads
-                    tasks.append(client.get(f"{gateway_url}/get/{key}"))
-                else:
-                    # 20% writes
-                    tasks.append(client.post(f"{gateway_url}/set/{key}", json={"value": value}))
-            
-            await asyncio.gather(*tasks, return_exceptions=True)
-            operations += len(tasks)
-        
-        actual_duration = time.time() - start_time
-        throughput = operations / actual_duration
+    # Warm up
+    await asyncio.gather(*[
+        bounded(sem, partial(client.post, f"/set/warmup_{i}", json={"value": f"value_{i}"}))
+        for i in range(100)
+    ], return_exceptions=True)
+    
+    # Build every request up front so the timed loop doesn't spend its
+    # time formatting URLs and encoding JSON bodies
+    num_keys = 10001
+    get_pool = [
+        client.build_request("GET", f"/get/perf_test_{i}")
+        for i in range(num_keys)
+    ]
+    set_pool = [
+        client.build_request(
+            "POST",
+            f"/set/perf_test_{i}",
+            content=encode_json({"value": f"value_{i}"}),
+            headers=JSON_HEADERS
+        )
+        for i in range(num_keys)
+    ]
+    
+    # Measure throughput for 10 seconds. The deadline is enforced on the
+    # in-flight batch too, so a slow last batch can't overrun the window;
+    # requests cancelled at the deadline aren't counted.
+    loop = asyncio.get_running_loop()
+    duration = 10.0
+    start_time = loop.time()
+    deadline = start_time + duration
+    operations = 0
+    
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
         
-        print(f"\nQuick throughput test:")
-        print(f"  Operations: {operations:,}")
-        print(f"  Duration: {actual_duration:.2f}s")
-        print(f"  Throughput: {throughput:,.0f} ops/sec")
+        tasks = []
+        for i in rng.choices(range(num_keys), k=100):  # Batch of 100
+            if rng.random() < 0.8:
+                # 80% reads
+                request = get_pool[i]
+            else:
+                # 20% writes
+                request = set_pool[i]
+            tasks.append(asyncio.ensure_future(bounded(sem, partial(client.send, request))))
         
-        # Should be well above single-node performance (76K)
-        # Might not hit 250K in this quick test, but should show improvement
-        assert throughput > 50000, f"Throughput too low: {throughput:.0f} ops/sec"
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), remaining)
+        except asyncio.TimeoutError:
+            pass
+        operations += sum(1 for task in tasks if not task.cancelled())
+    
+    actual_duration = loop.time() - start_time
+    throughput = operations / actual_duration
+    
+    print(f"\nQuick throughput test:")
+    print(f"  Operations: {operations:,}")
+    print(f"  Duration: {actual_duration:.2f}s")
+    print(f"  Throughput: {throughput:,.0f} ops/sec")
+    
+    # Should be well above single-node performance (76K)
+    # Might not hit 250K in this quick test, but should show improvement
+    assert throughput > 50000, f"Throughput too low: {throughput:.0f} ops/sec"
 
 
 if __name__ == "__main__":
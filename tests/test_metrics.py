@@ -0,0 +1,45 @@
+"""
+Tests for metric label guarding in distributed.metrics.
+"""
+
+import logging
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from distributed import metrics
+from distributed.metrics import _safe_labels, request_count
+
+
+@pytest.fixture(autouse=True)
+def fresh_reports(monkeypatch):
+    """Start every test with no unexpected labels reported yet."""
+    monkeypatch.setattr(metrics, "_reported_labels", set())
+    monkeypatch.setattr(metrics, "STRICT_LABELS", False)
+
+
+def test_allowed_value_is_kept():
+    """Test that an allowed label value is used as given."""
+    child = _safe_labels(request_count, node_id=1, operation='get')
+    assert child is request_count.labels(node_id=1, operation='get')
+
+
+def test_unknown_value_is_folded_and_warned_once(caplog):
+    """Test that an unknown value becomes 'other' and is logged only once."""
+    with caplog.at_level(logging.WARNING, logger=metrics.__name__):
+        first = _safe_labels(request_count, node_id=1, operation='health')
+        second = _safe_labels(request_count, node_id=1, operation='health')
+    
+    assert first is request_count.labels(node_id=1, operation='other')
+    assert second is first
+    
+    warnings = [r for r in caplog.records if "operation='health'" in r.getMessage()]
+    assert len(warnings) == 1
+
+
+def test_strict_mode_raises(monkeypatch):
+    """Test that strict mode rejects an unknown value instead of folding it."""
+    monkeypatch.setattr(metrics, "STRICT_LABELS", True)
+    
+    with pytest.raises(ValueError, match="not in allowed set"):
+        _safe_labels(request_count, node_id=1, operation='health')
@@ -1,344 +1,360 @@
 """
 Recovery tests for MiniKV.
 Tests crash recovery, WAL replay, and persistence.
+
+Each test gets its own temporary directory, so the suite can run in
+parallel with pytest-xdist:
+    python -m pytest -n auto tests/test_recovery.py
 """
 
-import unittest
 import os
-import tempfile
 import shutil
+import sys
+import tempfile
+import pytest
 from core.store import KeyValueStore
 from core.wal import WAL, WALEntry
 from core.persistence import SQLitePersistence
 
+# RAM-backed scratch space for tests that don't depend on real disk
+# durability, so their fsyncs don't hit a device; None means the default
+FAST_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+@pytest.fixture(scope="module")
+def wal_dir():
+    """One RAM-backed directory shared by every WAL test in the module."""
+    temp_dir = tempfile.mkdtemp(dir=FAST_TMP_DIR)
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def wal(wal_dir):
+    """An open WAL on a fresh file in the shared directory (removed with it)."""
+    fd, path = tempfile.mkstemp(suffix=".wal", dir=wal_dir)
+    os.close(fd)
+    wal = WAL(path)
+    wal.open()
+    yield wal
+    wal.close()
+
+
+@pytest.fixture
+def persistence():
+    """An in-memory database; these tests don't reopen it."""
+    persistence = SQLitePersistence(":memory:")
+    yield persistence
+    persistence.disconnect()
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    """On-disk database path, since recovery tests reopen it."""
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def wal_file(tmp_path):
+    """On-disk WAL path, since recovery tests replay it."""
+    return str(tmp_path / "test.wal")
+
+
+def open_store(db_file, wal_file=None):
+    """Open a store over db_file, with a WAL if wal_file is given."""
+    return KeyValueStore(
+        persistence=SQLitePersistence(db_file),
+        enable_wal=wal_file is not None,
+        wal_file=wal_file
+    )
+
+
+# Write-Ahead Log
+
+# Each case is a sequence of WAL calls and the (operation, key, value)
+# entries replay should return afterwards. An (EXPECT_ENTRIES, n) step
+# asserts the WAL's entry count at that point instead of calling it.
+EXPECT_ENTRIES = "expect_entries"
 
-class TestWAL(unittest.TestCase):
-    """Test the Write-Ahead Log."""
+WAL_CASES = {
+    "set_and_delete": (
+        [("log_set", "key1", "value1"), ("log_set", "key2", 42), ("log_delete", "key1")],
+        [("SET", "key1", "value1"), ("SET", "key2", 42), ("DELETE", "key1", None)]
+    ),
+    "truncate": (
+        [
+            ("log_set", "key1", "value1"),
+            ("log_set", "key2", "value2"),
+            (EXPECT_ENTRIES, 2),
+            ("truncate",)
+        ],
+        []
+    ),
+    "disable_enable": (
+        [
+            ("log_set", "key1", "value1"),
+            ("disable",),
+            ("log_set", "key2", "value2"),  # Should not be logged
+            ("enable",),
+            ("log_set", "key3", "value3")
+        ],
+        [("SET", "key1", "value1"), ("SET", "key3", "value3")]
+    ),
+}
+
+
+@pytest.mark.parametrize("calls, expected", WAL_CASES.values(), ids=WAL_CASES.keys())
+def test_wal_replay(wal, calls, expected):
+    """Test that replay returns exactly the logged operations."""
+    for method, *args in calls:
+        if method == EXPECT_ENTRIES:
+            assert wal.get_entry_count() == args[0]
+        else:
+            getattr(wal, method)(*args)
     
-    def setUp(self):
-        """Set up a temporary WAL file."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.wal_file = os.path.join(self.temp_dir, "test.wal")
-        self.wal = WAL(self.wal_file)
-        self.wal.open()
+    entries = wal.replay()
+    assert [(e.operation, e.key, e.value) for e in entries] == expected
     
-    def tearDown(self):
-        """Clean up temporary files."""
-        self.wal.close()
-        shutil.rmtree(self.temp_dir)
+    # Checkpoint reports the same entries
+    assert wal.checkpoint() == len(expected)
+    assert wal.get_entry_count() == len(expected)
+
+
+# Persistence layer
+
+def test_save_load(persistence):
+    """Test saving and loading data."""
+    persistence.save("key1", "value1")
+    persistence.save("key2", 42)
+    persistence.save("key3", {"nested": "object"})
     
-    def test_wal_logging(self):
-        """Test basic WAL logging."""
-        # Log operations
-        self.wal.log_set("key1", "value1")
-        self.wal.log_set("key2", 42)
-        self.wal.log_delete("key1")
-        
-        # Read back
-        entries = self.wal.replay()
-        self.assertEqual(len(entries), 3)
-        
-        self.assertEqual(entries[0].operation, "SET")
-        self.assertEqual(entries[0].key, "key1")
-        self.assertEqual(entries[0].value, "value1")
-        
-        self.assertEqual(entries[1].operation, "SET")
-        self.assertEqual(entries[1].key, "key2")
-        self.assertEqual(entries[1].value, 42)
-        
-        self.assertEqual(entries[2].operation, "DELETE")
-        self.assertEqual(entries[2].key, "key1")
+    assert persistence.load("key1") == "value1"
+    assert persistence.load("key2") == 42
+    assert persistence.load("key3") == {"nested": "object"}
+
+
+def test_delete(persistence):
+    """Test deleting data."""
+    persistence.save("key1", "value1")
+    assert persistence.exists("key1")
     
-    def test_wal_checkpoint(self):
-        """Test WAL checkpoint."""
-        self.wal.log_set("key1", "value1")
-        self.wal.log_set("key2", "value2")
-        
-        count = self.wal.checkpoint()
-        self.assertEqual(count, 2)
+    persistence.delete("key1")
+    assert not persistence.exists("key1")
+    assert persistence.load("key1") is None
+
+
+def test_load_all(persistence):
+    """Test loading all data."""
+    data = {
+        "key1": "value1",
+        "key2": 42,
+        "key3": [1, 2, 3]
+    }
     
-    def test_wal_truncate(self):
-        """Test WAL truncation."""
-        self.wal.log_set("key1", "value1")
-        self.wal.log_set("key2", "value2")
-        
-        self.assertEqual(self.wal.get_entry_count(), 2)
-        
-        self.wal.truncate()
-        
-        self.assertEqual(self.wal.get_entry_count(), 0)
+    persistence.save_many(data)
     
-    def test_wal_disable_enable(self):
-        """Test disabling and enabling WAL."""
-        self.wal.log_set("key1", "value1")
-        
-        self.wal.disable()
-        self.wal.log_set("key2", "value2")  # Should not be logged
-        
-        self.wal.enable()
-        self.wal.log_set("key3", "value3")
-        
-        entries = self.wal.replay()
-        # Only key1 and key3 should be logged
-        self.assertEqual(len(entries), 2)
-
-
-class TestPersistence(unittest.TestCase):
-    """Test the persistence layer."""
+    loaded = persistence.load_all()
+    assert loaded == data
+
+
+def test_clear(persistence):
+    """Test clearing all data."""
+    persistence.save("key1", "value1")
+    persistence.save("key2", "value2")
     
-    def setUp(self):
-        """Set up a temporary database."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_file = os.path.join(self.temp_dir, "test.db")
-        self.persistence = SQLitePersistence(self.db_file)
+    assert persistence.get_size() == 2
     
-    def tearDown(self):
-        """Clean up temporary files."""
-        self.persistence.disconnect()
-        shutil.rmtree(self.temp_dir)
+    persistence.clear()
     
-    def test_save_load(self):
-        """Test saving and loading data."""
-        self.persistence.save("key1", "value1")
-        self.persistence.save("key2", 42)
-        self.persistence.save("key3", {"nested": "object"})
-        
-        self.assertEqual(self.persistence.load("key1"), "value1")
-        self.assertEqual(self.persistence.load("key2"), 42)
-        self.assertEqual(self.persistence.load("key3"), {"nested": "object"})
+    assert persistence.get_size() == 0
+
+
+def test_update_existing(persistence):
+    """Test updating existing keys."""
+    persistence.save("key1", "old_value")
+    persistence.save("key1", "new_value")
     
-    def test_delete(self):
-        """Test deleting data."""
-        self.persistence.save("key1", "value1")
-        self.assertTrue(self.persistence.exists("key1"))
-        
-        self.persistence.delete("key1")
-        self.assertFalse(self.persistence.exists("key1"))
-        self.assertIsNone(self.persistence.load("key1"))
+    assert persistence.load("key1") == "new_value"
+    assert persistence.get_size() == 1
+
+
+# Crash recovery
+
+def write_sets(store):
+    store.set("key1", "value1")
+    store.set("key2", 42)
+    store.set("key3", [1, 2, 3])
+
+
+def write_with_deletes(store):
+    store.set("key1", "value1")
+    store.set("key2", "value2")
+    store.delete("key1")
+    store.set("key3", "value3")
+
+
+def write_mset(store):
+    store.mset({"key1": "value1", "key2": 42})
+    store.delete("key1")
+
+
+def write_with_clear(store):
+    store.set("key1", "value1")
+    store.set("key2", "value2")
+    store.clear()
+    store.set("key3", "value3")
+
+
+# Pre-crash write paths, by snapshot name
+CRASH_SCENARIOS = {
+    "sets": write_sets,
+    "deletes": write_with_deletes,
+    "mset": write_mset,
+    "clear": write_with_clear,
+}
+
+
+@pytest.fixture(scope="session")
+def crash_snapshots(tmp_path_factory):
+    """
+    Build each crashed store's DB and WAL files at most once per session.
+    Returns a function mapping a scenario name to its (db, wal) paths.
+    """
+    snapshots = {}
+    
+    def snapshot(name):
+        if name not in snapshots:
+            snapshot_dir = tmp_path_factory.mktemp(name)
+            db_file = str(snapshot_dir / "test.db")
+            wal_file = str(snapshot_dir / "test.wal")
+            
+            store = open_store(db_file, wal_file)
+            CRASH_SCENARIOS[name](store)
+            
+            # Simulate crash (don't call close, just destroy the object)
+            del store
+            snapshots[name] = (db_file, wal_file)
+        return snapshots[name]
+    
+    return snapshot
+
+
+@pytest.fixture
+def recover(crash_snapshots, tmp_path):
+    """
+    Copy a crash snapshot into this test's directory and reopen it there,
+    so the shared snapshot is never modified by recovery.
+    """
+    def reopen(name):
+        for path in crash_snapshots(name):
+            shutil.copy(path, tmp_path)
+        return open_store(str(tmp_path / "test.db"), str(tmp_path / "test.wal"))
+    
+    return reopen
+
+
+def test_recovery_from_wal(recover):
+    """Test recovering data from WAL after a crash."""
+    store = recover("sets")
+    
+    # Verify data was recovered
+    assert store.get("key1") == "value1"
+    assert store.get("key2") == 42
+    assert store.get("key3") == [1, 2, 3]
+    assert store.size() == 3
     
-    def test_load_all(self):
-        """Test loading all data."""
-        data = {
-            "key1": "value1",
-            "key2": 42,
-            "key3": [1, 2, 3]
-        }
-        
-        for key, value in data.items():
-            self.persistence.save(key, value)
-        
-        loaded = self.persistence.load_all()
-        self.assertEqual(loaded, data)
+    store.close()
+
+
+def test_recovery_with_deletes(recover):
+    """Test recovery with delete operations."""
+    store = recover("deletes")
     
-    def test_clear(self):
-        """Test clearing all data."""
-        self.persistence.save("key1", "value1")
-        self.persistence.save("key2", "value2")
-        
-        self.assertEqual(self.persistence.get_size(), 2)
-        
-        self.persistence.clear()
-        
-        self.assertEqual(self.persistence.get_size(), 0)
+    # key1 should be deleted
+    assert store.get("key1") is None
+    assert store.get("key2") == "value2"
+    assert store.get("key3") == "value3"
+    assert store.size() == 2
     
-    def test_update_existing(self):
-        """Test updating existing keys."""
-        self.persistence.save("key1", "old_value")
-        self.persistence.save("key1", "new_value")
-        
-        self.assertEqual(self.persistence.load("key1"), "new_value")
-        self.assertEqual(self.persistence.get_size(), 1)
+    store.close()
 
 
-class TestRecovery(unittest.TestCase):
-    """Test crash recovery scenarios."""
+def test_recovery_after_mset(recover):
+    """Test that a batched write is replayed from WAL after a crash."""
+    store = recover("mset")
     
-    def setUp(self):
-        """Set up temporary files."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_file = os.path.join(self.temp_dir, "test.db")
-        self.wal_file = os.path.join(self.temp_dir, "test.wal")
+    assert store.get("key1") is None
+    assert store.get("key2") == 42
+    assert store.size() == 1
     
-    def tearDown(self):
-        """Clean up temporary files."""
-        shutil.rmtree(self.temp_dir)
+    store.close()
+
+
+def test_recovery_with_clear(recover):
+    """Test recovery with clear operation."""
+    store = recover("clear")
     
-    def test_recovery_from_wal(self):
-        """Test recovering data from WAL after a crash."""
-        # Create store and write data
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        store.set("key1", "value1")
-        store.set("key2", 42)
-        store.set("key3", [1, 2, 3])
-        
-        # Simulate crash (don't call close, just destroy the object)
-        del store
-        
-        # Create new store - should recover from WAL
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        # Verify data was recovered
-        self.assertEqual(store.get("key1"), "value1")
-        self.assertEqual(store.get("key2"), 42)
-        self.assertEqual(store.get("key3"), [1, 2, 3])
-        self.assertEqual(store.size(), 3)
-        
-        store.close()
+    # Only key3 should remain
+    assert store.size() == 1
+    assert store.get("key3") == "value3"
     
-    def test_recovery_with_deletes(self):
-        """Test recovery with delete operations."""
-        # Create store
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        store.set("key1", "value1")
-        store.set("key2", "value2")
-        store.delete("key1")
-        store.set("key3", "value3")
-        
-        # Simulate crash
-        del store
-        
-        # Recover
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        # key1 should be deleted
-        self.assertIsNone(store.get("key1"))
-        self.assertEqual(store.get("key2"), "value2")
-        self.assertEqual(store.get("key3"), "value3")
-        self.assertEqual(store.size(), 2)
-        
-        store.close()
+    store.close()
+
+
+def write_one_by_one(store, data):
+    for key, value in data.items():
+        store.set(key, value)
+
+
+def write_batch(store, data):
+    store.mset(data)
+
+
+# set() persists with save(), mset() with save_many()
+@pytest.mark.parametrize("write", [write_one_by_one, write_batch], ids=["set", "mset"])
+def test_persistence_without_wal(db_file, write):
+    """Test loading from persistence when WAL is disabled."""
+    # Create store with persistence but no WAL
+    store = open_store(db_file)
+    
+    write(store, {"key1": "value1", "key2": "value2"})
+    store.close()
+    
+    # Create new store - should load from persistence
+    store = open_store(db_file)
+    
+    assert store.get("key1") == "value1"
+    assert store.get("key2") == "value2"
+    assert store.size() == 2
     
-    def test_recovery_with_clear(self):
-        """Test recovery with clear operation."""
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        store.set("key1", "value1")
-        store.set("key2", "value2")
-        store.clear()
-        store.set("key3", "value3")
-        
-        # Simulate crash
-        del store
-        
-        # Recover
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        # Only key3 should remain
-        self.assertEqual(store.size(), 1)
-        self.assertEqual(store.get("key3"), "value3")
-        
-        store.close()
+    store.close()
+
+
+def test_checkpoint_and_recovery(db_file, wal_file):
+    """Test checkpoint followed by recovery."""
+    store = open_store(db_file, wal_file)
     
-    def test_persistence_without_wal(self):
-        """Test loading from persistence when WAL is disabled."""
-        # Create store with persistence but no WAL
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=False
-        )
-        
-        store.set("key1", "value1")
-        store.set("key2", "value2")
-        store.close()
-        
-        # Create new store - should load from persistence
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=False
-        )
-        
-        self.assertEqual(store.get("key1"), "value1")
-        self.assertEqual(store.get("key2"), "value2")
-        self.assertEqual(store.size(), 2)
-        
-        store.close()
+    # Write data as one batch: one WAL write and one SQLite commit instead of 100
+    data = {f"key_{i}": i for i in range(100)}
+    store.mset(data)
     
-    def test_checkpoint_and_recovery(self):
-        """Test checkpoint followed by recovery."""
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        # Write data
-        for i in range(100):
-            store.set(f"key_{i}", i)
-        
-        # Checkpoint
-        stats = store.checkpoint()
-        self.assertEqual(stats['persisted_keys'], 100)
-        
-        # Close properly
-        store.close()
-        
-        # Reopen - should load from persistence
-        persistence = SQLitePersistence(self.db_file)
-        store = KeyValueStore(
-            persistence=persistence,
-            enable_wal=True,
-            wal_file=self.wal_file
-        )
-        
-        # Verify all data
-        self.assertEqual(store.size(), 100)
-        for i in range(100):
-            self.assertEqual(store.get(f"key_{i}"), i)
-        
-        store.close()
-
-
-def run_tests():
-    """Run all recovery tests."""
-    loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
+    # Checkpoint
+    stats = store.checkpoint()
+    assert stats['persisted_keys'] == 100
     
-    suite.addTests(loader.loadTestsFromTestCase(TestWAL))
-    suite.addTests(loader.loadTestsFromTestCase(TestPersistence))
-    suite.addTests(loader.loadTestsFromTestCase(TestRecovery))
+    # Close properly
+    store.close()
     
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
+    # Reopen - should load from persistence
+    store = open_store(db_file, wal_file)
     
-    return result.wasSuccessful()
+    # Verify all data from one snapshot rather than 100 locked gets
+    assert store.size() == 100
+    assert dict(store.items()) == data
+    
+    store.close()
 
 
 if __name__ == "__main__":
-    success = run_tests()
-    exit(0 if success else 1)
-
+    # Run tests
+    sys.exit(pytest.main([__file__, "-v"]))